@@ -0,0 +1,72 @@
+// SPDX-License-Identifier: MIT
+
+pragma solidity ^0.8.0;
+
+/**
+ * @dev Returns and logs values of every kind of ABI type, for checking the codecs generated by
+ * `yarn genabi --codecs` against ethers.
+ */
+contract AbiCodecMock {
+    struct Point {
+        int64 x;
+        int64 y;
+    }
+
+    struct Item {
+        uint256 id;
+        string name;
+        address[] holders;
+    }
+
+    event StaticLogged(address indexed account, int256 indexed delta, bool flag, int8 tiny);
+    event DynamicLogged(string indexed label, uint256[] ids, Item item, Point[2] points);
+
+    function echoStatic(uint8 small, int256 delta, address account, bool flag, bytes4 tag, int8 tiny)
+        public
+        pure
+        returns (uint8, int256, address, bool, bytes4, int8)
+    {
+        return (small, delta, account, flag, tag, tiny);
+    }
+
+    function echoDynamic(bytes memory data, string memory text, uint256[] memory ids)
+        public
+        pure
+        returns (bytes memory data_, string memory text_, uint256[] memory ids_)
+    {
+        return (data, text, ids);
+    }
+
+    function echoNested(
+        uint256[][] memory matrix,
+        bytes32[2][] memory pairs,
+        string[2] memory names,
+        int16[3] memory offsets
+    )
+        public
+        pure
+        returns (uint256[][] memory, bytes32[2][] memory, string[2] memory, int16[3] memory)
+    {
+        return (matrix, pairs, names, offsets);
+    }
+
+    function echoTuple(Point memory point, Item memory item, Item[] memory items)
+        public
+        pure
+        returns (Point memory point_, Item memory item_, Item[] memory items_)
+    {
+        return (point, item, items);
+    }
+
+    function echoPoint(Point memory point) public pure returns (Point memory) {
+        return point;
+    }
+
+    function emitStatic(address account, int256 delta, bool flag, int8 tiny) public {
+        emit StaticLogged(account, delta, flag, tiny);
+    }
+
+    function emitDynamic(string memory label, uint256[] memory ids, Item memory item, Point[2] memory points) public {
+        emit DynamicLogged(label, ids, item, points);
+    }
+}
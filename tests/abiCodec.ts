@@ -0,0 +1,231 @@
+import { BN } from "bn.js";
+import { BigNumber, utils } from "ethers";
+import { bignumberFrom } from "./utils";
+
+/**
+ * The building blocks of the calldata codecs generated by `python tools/generate_abi_typings.py --codecs`. The codec of
+ * each type is built once when its typings are loaded, and the selectors and head offsets are baked into the generated
+ * functions, so nothing needs to interpret the JSON ABI when encoding or decoding.
+ *
+ * Encoded data is hex without the 0x prefix, and offsets are in bytes.
+ */
+export interface Codec<Input, Output = Input> {
+    /** If the value is encoded in the tail, with only its offset in the head. */
+    dynamic : boolean;
+    /** The size of the value in the head (or of its offset, if dynamic). */
+    headSize : number;
+    encode : (value : Input) => string;
+    decode : (data : string, offset : number) => Output;
+}
+
+/** A log to decode an event from. */
+export interface Log {
+    topics : string[];
+    data : string;
+}
+
+const ZERO_WORD = "0".repeat(64);
+
+function padLeft(hex : string) {
+    return hex.length >= 64 ? hex : ZERO_WORD.slice(hex.length) + hex;
+}
+
+function padRight(hex : string) {
+    const remainder = hex.length % 64;
+    return remainder === 0 ? hex : hex + ZERO_WORD.slice(remainder);
+}
+
+function readWord(data : string, offset : number) {
+    return data.slice(offset * 2, offset * 2 + 64);
+}
+
+/** Strips the 0x prefix from the data. */
+export function strip(data : string) {
+    return data.startsWith("0x") ? data.slice(2) : data;
+}
+
+/** Reads a length or offset. */
+export function readNumber(data : string, offset : number) {
+    return parseInt(readWord(data, offset), 16);
+}
+
+/** Encodes the values in order, with the dynamic ones in the tail after the head of the given size. */
+export function encodeSequence(codecs : Codec<any, any>[], values : any[], headSize : number) {
+    let head = "";
+    let tail = "";
+    for (let i = 0; i < codecs.length; i++) {
+        const encoded = codecs[i].encode(values[i]);
+        if (codecs[i].dynamic) {
+            head += padLeft((headSize + tail.length / 2).toString(16));
+            tail += encoded;
+        } else {
+            head += encoded;
+        }
+    }
+
+    return head + tail;
+}
+
+/** Decodes the values in order, from the sequence at the given offset. */
+export function decodeSequence(codecs : Codec<any, any>[], data : string, offset : number) {
+    const values : any[] = [];
+    let head = offset;
+    for (const codec of codecs) {
+        values.push(codec.decode(data, codec.dynamic ? offset + readNumber(data, head) : head));
+        head += codec.headSize;
+    }
+
+    return values;
+}
+
+function headSizeOf(codecs : Codec<any, any>[]) {
+    return codecs.reduce((size, codec) => size + codec.headSize, 0);
+}
+
+export function uint(bits : number) : Codec<BigNumberish | typeof BN, BigNumber> {
+    const limit = BigNumber.from(2).pow(bits);
+    return {
+        dynamic : false,
+        headSize : 32,
+        encode : (value) => {
+            const number = bignumberFrom(value);
+            if (number.isNegative() || number.gte(limit)) {
+                throw new Error(`Value out of range for uint${bits}: ${number.toString()}`);
+            }
+            return padLeft(number.toHexString().slice(2));
+        },
+        decode : (data, offset) => BigNumber.from(`0x${readWord(data, offset)}`),
+    };
+}
+
+export function int(bits : number) : Codec<BigNumberish | typeof BN, BigNumber> {
+    const limit = BigNumber.from(2).pow(bits - 1);
+    return {
+        dynamic : false,
+        headSize : 32,
+        encode : (value) => {
+            const number = bignumberFrom(value);
+            if (number.lt(limit.mul(-1)) || number.gte(limit)) {
+                throw new Error(`Value out of range for int${bits}: ${number.toString()}`);
+            }
+            return padLeft(number.toTwos(256).toHexString().slice(2));
+        },
+        decode : (data, offset) => BigNumber.from(`0x${readWord(data, offset)}`).fromTwos(256),
+    };
+}
+
+export const address : Codec<string, Address> = {
+    dynamic : false,
+    headSize : 32,
+    encode : (value) => {
+        const hex = strip(value);
+        if (hex.length !== 40) {
+            throw new Error(`Invalid address: ${value}`);
+        }
+        return padLeft(hex.toLowerCase());
+    },
+    decode : (data, offset) => utils.getAddress(`0x${readWord(data, offset).slice(24)}`) as Address,
+};
+
+export const bool : Codec<boolean> = {
+    dynamic : false,
+    headSize : 32,
+    encode : (value) => padLeft(value ? "1" : "0"),
+    decode : (data, offset) => readNumber(data, offset) !== 0,
+};
+
+export function fixedBytes(size : number) : Codec<string> {
+    return {
+        dynamic : false,
+        headSize : 32,
+        encode : (value) => {
+            const hex = strip(utils.hexlify(value));
+            if (hex.length !== size * 2) {
+                throw new Error(`Invalid bytes${size}: ${value}`);
+            }
+            return padRight(hex);
+        },
+        decode : (data, offset) => `0x${data.slice(offset * 2, offset * 2 + size * 2)}`,
+    };
+}
+
+export const bytes : Codec<string> = {
+    dynamic : true,
+    headSize : 32,
+    encode : (value) => {
+        const hex = strip(utils.hexlify(value));
+        return padLeft((hex.length / 2).toString(16)) + padRight(hex);
+    },
+    decode : (data, offset) => {
+        const start = (offset + 32) * 2;
+        return `0x${data.slice(start, start + readNumber(data, offset) * 2)}`;
+    },
+};
+
+export const string : Codec<string> = {
+    dynamic : true,
+    headSize : 32,
+    encode : (value) => bytes.encode(utils.hexlify(utils.toUtf8Bytes(value))),
+    decode : (data, offset) => utils.toUtf8String(bytes.decode(data, offset)),
+};
+
+/** An array of the given length, or of any length if not given. */
+export function array<Input, Output>(item : Codec<Input, Output>, length? : number) : Codec<Input[], Output[]> {
+    if (length !== undefined) {
+        const items = new Array<Codec<Input, Output>>(length).fill(item);
+        const headSize = headSizeOf(items);
+        return {
+            dynamic : item.dynamic,
+            headSize : item.dynamic ? 32 : headSize,
+            encode : (values) => {
+                if (values.length !== length) {
+                    throw new Error(`Expected ${length} values, got ${values.length}`);
+                }
+                return encodeSequence(items, values, headSize);
+            },
+            decode : (data, offset) => decodeSequence(items, data, offset) as Output[],
+        };
+    }
+
+    return {
+        dynamic : true,
+        headSize : 32,
+        encode : (values) => {
+            const items = new Array<Codec<Input, Output>>(values.length).fill(item);
+            return padLeft(values.length.toString(16)) + encodeSequence(items, values, headSizeOf(items));
+        },
+        decode : (data, offset) => {
+            const items = new Array<Codec<Input, Output>>(readNumber(data, offset)).fill(item);
+            return decodeSequence(items, data, offset + 32) as Output[];
+        },
+    };
+}
+
+/**
+ * A tuple of the given components, by name (or by index, if unnamed). Tuples are decoded with both their names and
+ * indices, like the results of calls.
+ */
+export function tuple(components : Codec<any, any>[], names : string[]) : Codec<any, any> {
+    const dynamic = components.some((_) => _.dynamic);
+    const headSize = headSizeOf(components);
+    return {
+        dynamic,
+        headSize : dynamic ? 32 : headSize,
+        encode : (value) => encodeSequence(
+            components,
+            names.map((name, i) => (Array.isArray(value) || name === "" ? value[i] : value[name])),
+            headSize
+        ),
+        decode : (data, offset) => {
+            const values = decodeSequence(components, data, offset);
+            const decoded : Record<string, any> = {};
+            names.forEach((name, i) => {
+                decoded[i] = values[i];
+                if (name !== "") {
+                    decoded[name] = values[i];
+                }
+            });
+            return decoded;
+        },
+    };
+}
@@ -0,0 +1,192 @@
+import { BigNumber, utils } from "ethers";
+import * as AbiCodecMock from "~/abi/AbiCodecMock";
+import * as codec from "~/abiCodec";
+import { DESCRIBE, IT } from "~/utils";
+
+interface FunctionCodec {
+    selector : string;
+    encode : (...args : any[]) => string;
+    decode? : (data : string) => unknown;
+}
+
+interface EventCodec {
+    topic? : string;
+    decode : (log : codec.Log) => unknown;
+}
+
+// The codecs are only generated by `yarn genabi --codecs`.
+const GENERATED = AbiCodecMock as unknown as {
+    AbiCodecMockCodecs? : Record<string, FunctionCodec>;
+    AbiCodecMockEventCodecs? : Record<string, EventCodec>;
+};
+
+const MAX_UINT256 = BigNumber.from(2).pow(256).sub(1);
+const MIN_INT256 = BigNumber.from(2).pow(255).mul(-1);
+const MAX_INT64 = BigNumber.from(2).pow(63).sub(1);
+const MIN_INT64 = BigNumber.from(2).pow(63).mul(-1);
+
+const ACCOUNT = "0x5B38Da6a701c568545dCfcB03FcB875f56beddC4";
+const OTHER_ACCOUNT = "0xAb8483F64d9C6d1EcF9b849Ae677dD3315835cb2";
+const HASH = utils.keccak256(utils.toUtf8Bytes("AbiCodecMock"));
+const ZERO_HASH = `0x${"00".repeat(32)}`;
+// Longer than a word, so that it is padded to two.
+const LONG_BYTES = `0x${"ab".repeat(33)}`;
+
+const POINT_TYPE = "tuple(int64 x, int64 y)";
+const ITEM_TYPE = "tuple(uint256 id, string name, address[] holders)";
+const POINT = codec.tuple([codec.int(64), codec.int(64)], ["x", "y"]);
+const ITEM = codec.tuple([codec.uint(256), codec.string, codec.array(codec.address)], ["id", "name", "holders"]);
+const ITEM_VALUE = { id : 7, name : "héllo wörld", holders : [ACCOUNT, OTHER_ACCOUNT] };
+const EMPTY_ITEM_VALUE = { id : 0, name : "", holders : [] };
+
+/** The ABI type, the runtime codec of that type and the value to encode with both. */
+const CASES : [string, codec.Codec<any, any>, unknown][] = [
+    ["uint8", codec.uint(8), 255],
+    ["uint256", codec.uint(256), MAX_UINT256],
+    ["int8", codec.int(8), -128],
+    ["int256", codec.int(256), -1],
+    ["int256", codec.int(256), MIN_INT256],
+    ["address", codec.address, ACCOUNT],
+    ["bool", codec.bool, true],
+    ["bytes4", codec.fixedBytes(4), "0x01ffc9a7"],
+    ["bytes32", codec.fixedBytes(32), HASH],
+    ["bytes", codec.bytes, "0x"],
+    ["bytes", codec.bytes, LONG_BYTES],
+    ["string", codec.string, "héllo wörld"],
+    ["uint256[]", codec.array(codec.uint(256)), [1, 2, MAX_UINT256]],
+    ["int64[2]", codec.array(codec.int(64), 2), [-1, MIN_INT64]],
+    ["string[]", codec.array(codec.string), ["a", "", "héllo wörld"]],
+    ["uint256[][]", codec.array(codec.array(codec.uint(256))), [[1], [], [2, 3]]],
+    ["bytes32[2][]", codec.array(codec.array(codec.fixedBytes(32), 2)), [[HASH, ZERO_HASH], [ZERO_HASH, HASH]]],
+    ["string[2][]", codec.array(codec.array(codec.string, 2)), [["a", "b"], ["", "héllo wörld"]]],
+    [POINT_TYPE, POINT, { x : -5, y : MAX_INT64 }],
+    [`${POINT_TYPE}[2]`, codec.array(POINT, 2), [{ x : -1, y : 1 }, { x : MIN_INT64, y : 0 }]],
+    [ITEM_TYPE, ITEM, ITEM_VALUE],
+    [`${ITEM_TYPE}[]`, codec.array(ITEM), [ITEM_VALUE, EMPTY_ITEM_VALUE]],
+];
+
+/** The arguments to call each function of AbiCodecMock with. The echo functions also return them. */
+const CALLS : Record<string, unknown[]> = {
+    echoStatic : [255, MIN_INT256, ACCOUNT, true, "0x01ffc9a7", -128],
+    echoDynamic : [LONG_BYTES, "héllo wörld", [1, 2, MAX_UINT256]],
+    echoNested : [[[1], [], [2, 3]], [[HASH, ZERO_HASH], [ZERO_HASH, HASH]], ["a", ""], [-1, 0, 300]],
+    echoTuple : [{ x : -5, y : 7 }, ITEM_VALUE, [ITEM_VALUE, EMPTY_ITEM_VALUE]],
+    echoPoint : [{ x : MIN_INT64, y : MAX_INT64 }],
+    emitStatic : [ACCOUNT, -1, false, -1],
+    emitDynamic : ["label", [1, MAX_UINT256], ITEM_VALUE, [{ x : -1, y : 1 }, { x : MIN_INT64, y : 0 }]],
+};
+
+/** The values to log each event of AbiCodecMock with. */
+const LOGS : Record<string, unknown[]> = {
+    StaticLogged : [ACCOUNT, MIN_INT256, true, -1],
+    DynamicLogged : ["label", [1, MAX_UINT256], ITEM_VALUE, [{ x : -1, y : 1 }, { x : MIN_INT64, y : MAX_INT64 }]],
+};
+
+/**
+ * Converts decoded values to nested arrays of strings, so that those decoded by ethers (which are arrays, and numbers
+ * for small integers) can be compared with those decoded by the codecs (which are objects by index and name).
+ */
+function normalize(value : unknown) : unknown {
+    if (BigNumber.isBigNumber(value) || typeof value === "number") {
+        return value.toString();
+    }
+    if (utils.Indexed.isIndexed(value)) {
+        return value.hash;
+    }
+    if (Array.isArray(value)) {
+        return value.map(normalize);
+    }
+    if (typeof value === "object" && value !== null) {
+        const values : unknown[] = [];
+        for (let i = 0; i in value; i++) {
+            values.push(normalize((value as Record<number, unknown>)[i]));
+        }
+        return values;
+    }
+
+    return value;
+}
+
+export function runTests() {
+    DESCRIBE("ABI codecs", () => {
+        DESCRIBE("Runtime codecs", test_runtimeCodecs);
+        DESCRIBE("Generated codecs", test_generatedCodecs);
+    });
+}
+
+function test_runtimeCodecs() {
+    CASES.forEach(([type, coder, value]) => {
+        IT(`encodes ${type} like ethers`, () => {
+            const encoded = codec.encodeSequence([coder], [value], coder.headSize);
+            assert.strictEqual(`0x${encoded}`, utils.defaultAbiCoder.encode([type], [value]));
+        });
+
+        IT(`decodes ${type} like ethers`, () => {
+            const data = utils.defaultAbiCoder.encode([type], [value]);
+            const decoded = codec.decodeSequence([coder], codec.strip(data), 0)[0] as unknown;
+            assert.deepEqual(normalize(decoded), normalize(utils.defaultAbiCoder.decode([type], data)[0]));
+        });
+    });
+
+    IT("decodes tuples by name", () => {
+        const data = utils.defaultAbiCoder.encode([ITEM_TYPE], [ITEM_VALUE]);
+        const decoded = codec.decodeSequence([ITEM], codec.strip(data), 0)[0] as Record<string, unknown>;
+        assert.strictEqual(decoded.name, ITEM_VALUE.name);
+        assert.deepEqual(decoded.holders, ITEM_VALUE.holders);
+    });
+}
+
+function test_generatedCodecs() {
+    const abi = new utils.Interface(AbiCodecMock.AbiCodecMockABI);
+
+    before(function () {
+        if (GENERATED.AbiCodecMockCodecs === undefined) {
+            this.skip();
+        }
+    });
+
+    IT("has a codec for every function and event", () => {
+        assert.sameMembers(Object.keys(GENERATED.AbiCodecMockCodecs ?? {}), Object.keys(CALLS));
+        assert.sameMembers(Object.keys(GENERATED.AbiCodecMockEventCodecs ?? {}), Object.keys(LOGS));
+    });
+
+    Object.entries(CALLS).forEach(([name, args]) => {
+        IT(`encodes the calldata of ${name} like ethers`, () => {
+            const coder = (GENERATED.AbiCodecMockCodecs ?? {})[name];
+            assert.strictEqual(coder.selector, abi.getSighash(name));
+            assert.strictEqual(coder.encode(...args), abi.encodeFunctionData(name, args));
+        });
+
+        IT(`decodes the result of ${name} like ethers`, () => {
+            const coder = (GENERATED.AbiCodecMockCodecs ?? {})[name];
+            const outputs = abi.getFunction(name).outputs ?? [];
+            assert.strictEqual(coder.decode !== undefined, outputs.length > 0);
+            if (coder.decode === undefined) {
+                return;
+            }
+
+            // The echo functions return their arguments.
+            const data = abi.encodeFunctionResult(name, args);
+            const result = abi.decodeFunctionResult(name, data);
+            assert.deepEqual(normalize(coder.decode(data)), normalize(outputs.length === 1 ? result[0] : result));
+        });
+    });
+
+    Object.entries(LOGS).forEach(([name, values]) => {
+        IT(`decodes the log of ${name} like ethers`, () => {
+            const coder = (GENERATED.AbiCodecMockEventCodecs ?? {})[name];
+            const event = abi.getEvent(name);
+            const log = abi.encodeEventLog(event, values);
+            assert.strictEqual(coder.topic, log.topics[0]);
+            assert.deepEqual(normalize(coder.decode(log)), normalize(abi.decodeEventLog(event, log.data, log.topics)));
+        });
+    });
+
+    IT("decodes results by name", () => {
+        const coder = (GENERATED.AbiCodecMockCodecs ?? {}).echoTuple;
+        const args = CALLS.echoTuple;
+        const decoded = coder.decode?.(abi.encodeFunctionResult("echoTuple", args)) as Record<string, any>;
+        assert.strictEqual(decoded.item_.name, ITEM_VALUE.name);
+        assert.strictEqual(decoded.point_.x.toString(), "-5");
+    });
+}
@@ -2,6 +2,7 @@
 (require("source-map-support") as { install : () => void }).install();
 
 // Import test suites
+import * as codecs from "./codecs";
 import * as openzeppelin from "./openzeppelin";
 import * as erc1155m from "./erc1155m";
 import * as erc20Emulator from "./erc20Emulator";
@@ -12,3 +13,4 @@ openzeppelin.runTests();
 erc1155m.runTests();
 metatokens.runTests();
 erc20Emulator.runTests();
+codecs.runTests();
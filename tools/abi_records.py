@@ -0,0 +1,66 @@
+import marshal
+import sys
+import zlib
+
+# Compact, render-ready records of a parsed ABI, cached by generate_abi_typings.py between runs. The type strings are
+# interned, as the same few types are repeated throughout every contract.
+
+class Parameter:
+    __slots__ = ("name", "type")
+
+    def __init__(self, name, type):
+        self.name = name
+        self.type = sys.intern(type)
+
+class Function:
+    __slots__ = ("name", "parameters", "result", "mutability")
+
+    def __init__(self, name, parameters, result, mutability):
+        self.name = name
+        self.parameters = parameters
+        self.result = None if result is None else sys.intern(result)
+        self.mutability = sys.intern(mutability)
+
+class Event:
+    __slots__ = ("name", "properties", "anonymous")
+
+    def __init__(self, name, properties, anonymous):
+        self.name = name
+        self.properties = properties
+        self.anonymous = anonymous
+
+# A contract's parsed functions and events, its rendered constants (the ABI and its hashes) and the selectors of its
+# functions, which only depend on the ABI.
+class ParsedContract:
+    __slots__ = ("contract", "source", "functions", "events", "constants", "selectors")
+
+    def __init__(self, contract, source, functions, events, constants, selectors):
+        self.contract = contract
+        self.source = source
+        self.functions = functions
+        self.events = events
+        self.constants = constants
+        self.selectors = selectors
+
+# Serializes the contract as plain tuples with marshal, which is several times faster than pickling the records. The
+# constants are most of a contract, and compress well.
+def dump_contract(parsed):
+    return marshal.dumps((
+        parsed.contract,
+        parsed.source,
+        [(f.name, [(p.name, p.type) for p in f.parameters], f.result, f.mutability) for f in parsed.functions],
+        [(e.name, [(p.name, p.type) for p in e.properties], e.anonymous) for e in parsed.events],
+        zlib.compress(bytes(parsed.constants, "UTF-8"), 1),
+        parsed.selectors,
+    ))
+
+def load_contract(data):
+    contract, source, functions, events, constants, selectors = marshal.loads(data)
+    return ParsedContract(
+        contract,
+        source,
+        [Function(name, [Parameter(*_) for _ in parameters], result, mutability) for name, parameters, result, mutability in functions],
+        [Event(name, [Parameter(*_) for _ in properties], anonymous) for name, properties, anonymous in events],
+        str(zlib.decompress(constants), "UTF-8"),
+        selectors,
+    )
@@ -0,0 +1,392 @@
+import json
+import random
+import sys
+from argparse import ArgumentParser
+from hashlib import sha1
+from os import makedirs, stat, walk
+from os.path import abspath, dirname, exists, join
+from shutil import rmtree
+from subprocess import DEVNULL, Popen
+from tempfile import mkdtemp
+from time import perf_counter
+
+try:
+    from os import wait4, waitstatus_to_exitcode
+except ImportError:
+    # Not available on Windows, so we can't measure peak memory there.
+    wait4 = None
+
+TOOLS_DIR = dirname(abspath(__file__))
+GENABI = "generate_abi_typings.py"
+FLATTEN = "flatten_all.py"
+
+SOURCE_DIR = "contracts/generated"
+BUILD_INFO_DIR = "artifacts/build-info"
+OUTPUT_DIRS = {
+    GENABI : "tests/abi",
+    FLATTEN : "flattened",
+}
+SOURCES_PER_DIR = 100
+LIBRARY_IMPORT = "@openzeppelin/contracts/utils/introspection/IERC165.sol"
+LICENSE = "// SPDX-License-Identifier: MIT"
+PRAGMA = "pragma solidity ^0.8.13;"
+
+# Parameter types weighted roughly by how often they appear in the repo's contracts.
+TYPES = ["address"] * 6 + ["uint256"] * 8 + ["bool"] * 2 + [
+    "address[]", "bytes", "bytes32", "bytes4", "string", "uint256[]", "uint8",
+]
+MUTABILITIES = ["view"] * 4 + ["nonpayable"] * 4 + ["pure", "payable"]
+DOCS = [
+    "Returns the balance of the given account.",
+    "@dev Transfers the tokens, calling the hooks of every registered extension.",
+    "@notice Registers the extension.\n @param extension The address of the extension.\n @return If it was registered.",
+    "@inheritdoc IERC165",
+]
+
+# A synthetic contract: its ABI, where its functions and events are defined, and how it was compiled.
+class Contract:
+    def __init__(self, index, bases):
+        self.index = index
+        self.name = "Contract%sMock" % index
+        self.source = "%s/g%s/%s.sol" % (SOURCE_DIR, index // SOURCES_PER_DIR, self.name)
+        self.id = index + 1
+        self.bases = bases
+        self.functions = []
+        self.events = []
+        self.linearized = [self.id]
+        for base in bases:
+            for base_id in base.linearized:
+                if base_id not in self.linearized:
+                    self.linearized.append(base_id)
+
+    def abi(self, contracts):
+        # Like solc, the ABI includes everything that is inherited.
+        abi = []
+        seen = {}
+        for base_id in self.linearized:
+            for item in contracts[base_id - 1].functions + contracts[base_id - 1].events:
+                if item["name"] not in seen:
+                    seen[item["name"]] = True
+                    abi.append(item)
+        return abi
+
+def make_parameter(rng, i, indexed=None):
+    type = rng.choice(TYPES)
+    parameter = {
+        "internalType" : type,
+        "name" : "" if rng.random() < 0.1 else "value%s" % i,
+        "type" : type,
+    }
+    if indexed is not None:
+        parameter["indexed"] = indexed
+    return parameter
+
+def make_contract(rng, index, contracts):
+    bases = []
+    if index > 0:
+        for _ in range(rng.randint(0, 2)):
+            base = contracts[rng.randrange(max(0, index - 50), index)]
+            if base not in bases:
+                bases.append(base)
+
+    contract = Contract(index, bases)
+    for i in range(rng.randint(10, 40)):
+        outputs = [make_parameter(rng, 0)] if rng.random() < 0.6 else []
+        contract.functions.append({
+            "inputs" : [make_parameter(rng, _) for _ in range(rng.randint(0, 5))],
+            "name" : "function%sOf%s" % (i, index),
+            "outputs" : outputs,
+            "stateMutability" : rng.choice(MUTABILITIES),
+            "type" : "function",
+        })
+    for i in range(rng.randint(2, 6)):
+        contract.events.append({
+            "anonymous" : False,
+            "inputs" : [make_parameter(rng, _, rng.random() < 0.5) for _ in range(rng.randint(1, 4))],
+            "name" : "Event%sOf%s" % (i, index),
+            "type" : "event",
+        })
+
+    return contract
+
+def make_ast(rng, contract):
+    nodes = []
+    for item in contract.functions + contract.events:
+        node = {
+            "id" : rng.randrange(1 << 24),
+            "name" : item["name"],
+            "nodeType" : "FunctionDefinition" if item["type"] == "function" else "EventDefinition",
+        }
+        if item["type"] == "function":
+            node["visibility"] = rng.choice(["external", "public"])
+        if rng.random() < 0.6:
+            node["documentation"] = {
+                "id" : rng.randrange(1 << 24),
+                "nodeType" : "StructuredDocumentation",
+                "text" : rng.choice(DOCS),
+            }
+        nodes.append(node)
+
+    return {
+        "absolutePath" : contract.source,
+        "id" : contract.id,
+        "nodeType" : "SourceUnit",
+        "nodes" : [
+            {"id" : rng.randrange(1 << 24), "literals" : ["solidity", "^", "0.8", ".13"], "nodeType" : "PragmaDirective"},
+            {
+                "baseContracts" : [{"baseName" : {"name" : base.name, "referencedDeclaration" : base.id}} for base in contract.bases],
+                "contractKind" : "contract",
+                "id" : contract.id,
+                "linearizedBaseContracts" : contract.linearized,
+                "name" : contract.name,
+                "nodeType" : "ContractDefinition",
+                "nodes" : nodes,
+            },
+        ],
+    }
+
+def make_source(rng, contract, extra=""):
+    lines = [LICENSE, PRAGMA, ""]
+    if contract.index % 10 == 0:
+        lines.append('import "%s";' % LIBRARY_IMPORT)
+    for base in contract.bases:
+        if dirname(base.source) == dirname(contract.source):
+            lines.append('import "./%s.sol";' % base.name)
+        else:
+            lines.append('import "../g%s/%s.sol";' % (base.index // SOURCES_PER_DIR, base.name))
+    lines.append("")
+
+    inherits = ""
+    if len(contract.bases) > 0:
+        inherits = " is %s" % ", ".join([base.name for base in contract.bases])
+    lines.append("contract %s%s {" % (contract.name, inherits))
+    for function in contract.functions:
+        lines.append("    /// @dev Synthetic function.")
+        lines.append("    function %s() external {}" % function["name"])
+        lines.append("")
+    lines.append(extra)
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def write_json(path, value, indent=None):
+    makedirs(dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(value, f, indent=indent)
+
+def write_text(path, text):
+    makedirs(dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+# Writes the artifacts of the given contracts along with a single build info file for their compilation, like hardhat.
+def write_compilation(project, rng, contracts, compiled, sources):
+    input_sources = {}
+    output_contracts = {}
+    output_sources = {}
+    for contract in compiled:
+        bytecode = "%02x" % rng.randrange(256) * rng.randint(2048, 8192)
+        input_sources[contract.source] = {"content" : sources[contract.source]}
+        output_contracts[contract.source] = {
+            contract.name : {
+                "abi" : contract.abi(contracts),
+                "evm" : {
+                    "bytecode" : {"object" : bytecode},
+                    "deployedBytecode" : {"object" : bytecode[64:]},
+                },
+            },
+        }
+        output_sources[contract.source] = {"ast" : make_ast(rng, contract), "id" : contract.id}
+
+    build_input = {"language" : "Solidity", "settings" : {"optimizer" : {"enabled" : True, "runs" : 200}}, "sources" : input_sources}
+    build_id = sha1(json.dumps(build_input, sort_keys=True).encode("utf-8")).hexdigest()
+    write_json(join(project, BUILD_INFO_DIR, "%s.json" % build_id), {
+        "_format" : "hh-sol-build-info-1",
+        "id" : build_id,
+        "input" : build_input,
+        "output" : {"contracts" : output_contracts, "sources" : output_sources},
+        "solcLongVersion" : "0.8.13+commit.abaa5c0e",
+        "solcVersion" : "0.8.13",
+    })
+
+    for contract in compiled:
+        artifact_dir = join(project, "artifacts", contract.source)
+        bytecode = output_contracts[contract.source][contract.name]["evm"]
+        write_json(join(artifact_dir, "%s.json" % contract.name), {
+            "_format" : "hh-sol-artifact-1",
+            "contractName" : contract.name,
+            "sourceName" : contract.source,
+            "abi" : contract.abi(contracts),
+            "bytecode" : "0x%s" % bytecode["bytecode"]["object"],
+            "deployedBytecode" : "0x%s" % bytecode["deployedBytecode"]["object"],
+            "linkReferences" : {},
+            "deployedLinkReferences" : {},
+        }, 2)
+        write_json(join(artifact_dir, "%s.dbg.json" % contract.name), {
+            "_format" : "hh-sol-dbg-1",
+            "buildInfo" : "%s/build-info/%s.json" % ("/".join([".."] * (contract.source.count("/") + 1)), build_id),
+        }, 2)
+
+# Generates a synthetic project with the given number of contracts. Returns the contracts and their sources.
+def generate_project(project, size, seed):
+    rng = random.Random(seed)
+    makedirs(join(project, "tools"), exist_ok=True)
+    makedirs(join(project, OUTPUT_DIRS[GENABI]), exist_ok=True)
+
+    contracts = []
+    for index in range(size):
+        contracts.append(make_contract(rng, index, contracts))
+
+    sources = {}
+    for contract in contracts:
+        sources[contract.source] = make_source(rng, contract)
+        write_text(join(project, contract.source), sources[contract.source])
+    write_text(join(project, "node_modules", LIBRARY_IMPORT), "%s\n%s\n\ninterface IERC165 {}\n" % (LICENSE, PRAGMA))
+
+    write_compilation(project, rng, contracts, contracts, sources)
+    return rng, contracts, sources
+
+# Simulates editing a single contract and recompiling it (and everything that inherits from it), like an incremental
+# hardhat compile.
+def edit_contract(project, rng, contracts, sources, contract):
+    contract.functions.append({
+        "inputs" : [make_parameter(rng, 0)],
+        "name" : "edited%s" % len(contract.functions),
+        "outputs" : [],
+        "stateMutability" : "nonpayable",
+        "type" : "function",
+    })
+    sources[contract.source] = make_source(rng, contract, "    // Edited.")
+    write_text(join(project, contract.source), sources[contract.source])
+    write_compilation(project, rng, contracts, [_ for _ in contracts if contract.id in _.linearized], sources)
+
+# Returns the modification time and size of every file under the directory.
+def snapshot(directory):
+    files = {}
+    for root, dirs, names in walk(directory):
+        for name in names:
+            details = stat(join(root, name))
+            files[join(root, name)] = (details.st_mtime_ns, details.st_size)
+    return files
+
+# Runs one of the tools in the project, returning the wall time, peak RSS (in MB) and the number of files written.
+def run_tool(project, tool, args):
+    output_dir = join(project, OUTPUT_DIRS[tool])
+    before = snapshot(output_dir)
+
+    start = perf_counter()
+    process = Popen([sys.executable, join(TOOLS_DIR, tool)] + args, cwd=project, stdout=DEVNULL, stderr=DEVNULL)
+    peak_rss = None
+    if wait4 is not None:
+        _, status, usage = wait4(process.pid, 0)
+        returncode = waitstatus_to_exitcode(status)
+        # Linux reports kilobytes, macOS reports bytes.
+        peak_rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    else:
+        returncode = process.wait()
+    seconds = perf_counter() - start
+
+    if returncode != 0:
+        raise Exception("%s exited with %s (rerun with --keep to inspect the project)" % (tool, returncode))
+
+    after = snapshot(output_dir)
+    written = len([path for path in after if before.get(path) != after[path]])
+
+    return seconds, peak_rss, written
+
+def benchmark_size(size, seed, jobs, keep):
+    project = mkdtemp(prefix="metatokens-benchmark-%s-" % size)
+    results = []
+    try:
+        print("Generating %s contracts in: %s" % (size, project))
+        rng, contracts, sources = generate_project(project, size, seed)
+
+        # Edit a contract that other contracts inherit from, so the incremental runs have some dependents to handle.
+        edited = contracts[0]
+        for contract in contracts:
+            if len(contract.bases) > 0:
+                edited = contract.bases[0]
+                break
+
+        genabi_args = ["--jobs", str(jobs)] if jobs > 1 else []
+        for tool, args in [(GENABI, genabi_args), (FLATTEN, [])]:
+            for scenario in ["full", "no-op"]:
+                results.append(measure(project, size, tool, args, scenario))
+
+        edit_contract(project, rng, contracts, sources, edited)
+        for tool, args in [(GENABI, genabi_args), (FLATTEN, [])]:
+            results.append(measure(project, size, tool, args, "incremental"))
+    finally:
+        if not keep:
+            rmtree(project, ignore_errors=True)
+
+    return results
+
+def measure(project, size, tool, args, scenario):
+    seconds, peak_rss, written = run_tool(project, tool, args)
+    result = {
+        "tool" : tool,
+        "scenario" : scenario,
+        "size" : size,
+        "seconds" : round(seconds, 4),
+        "peak_rss_mb" : None if peak_rss is None else round(peak_rss, 1),
+        "files_written" : written,
+    }
+    print("  %-24s %-12s %8.3fs %10s MB %7s files" % (
+        tool, scenario, seconds, "-" if peak_rss is None else "%.1f" % peak_rss, written,
+    ))
+    return result
+
+def result_key(result):
+    return (result["tool"], result["scenario"], result["size"])
+
+# Prints the change of each result relative to the baseline. Returns the results that regressed past the threshold.
+def compare(results, baseline, threshold):
+    previous = {}
+    for result in baseline:
+        previous[result_key(result)] = result
+
+    regressions = []
+    print("\nCompared to baseline:")
+    for result in results:
+        key = result_key(result)
+        if key not in previous:
+            continue
+
+        old = previous[key]
+        change = (result["seconds"] - old["seconds"]) / max(old["seconds"], 1e-9) * 100
+        print("  %-24s %-12s %6s  %+7.1f%% time  %s -> %s files" % (
+            key[0], key[1], key[2], change, old["files_written"], result["files_written"],
+        ))
+        if change > threshold:
+            regressions.append(result)
+
+    return regressions
+
+def main():
+    parser = ArgumentParser(description="Benchmarks generate_abi_typings.py and flatten_all.py on synthetic projects.")
+    parser.add_argument("--sizes", default="50,500,5000", help="comma separated number of contracts to generate")
+    parser.add_argument("--seed", type=int, default=1155, help="the seed for the synthetic projects")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="passed through to generate_abi_typings.py")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against the results previously written with --json")
+    parser.add_argument("--threshold", type=float, default=10, help="the %% slowdown that counts as a regression")
+    parser.add_argument("--keep", action="store_true", help="don't delete the generated projects")
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(_) for _ in args.sizes.split(",")]:
+        results += benchmark_size(size, args.seed, args.jobs, args.keep)
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if args.baseline is not None and exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if len(regressions) > 0:
+            print("\n%s regression(s) over %s%%" % (len(regressions), args.threshold))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
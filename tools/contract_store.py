@@ -0,0 +1,186 @@
+import hashlib
+import json
+import sqlite3
+from os import stat, walk
+from os.path import abspath, exists, join
+from urllib.request import pathname2url
+
+STORE_FILE = "tools/.contracts.sqlite"
+
+# Bump this whenever the tables change; older stores are then rebuilt from scratch.
+SCHEMA_VERSION = 3
+SCHEMA = [
+    """CREATE TABLE artifacts (
+        path TEXT PRIMARY KEY,
+        mtime INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        debug_mtime INTEGER,
+        debug_size INTEGER,
+        source TEXT NOT NULL,
+        contract TEXT NOT NULL,
+        abi_hash TEXT NOT NULL,
+        build_info TEXT NOT NULL
+    )""",
+    """CREATE TABLE sources (
+        path TEXT PRIMARY KEY,
+        file TEXT NOT NULL,
+        mtime INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,
+        imports TEXT NOT NULL
+    )""",
+    """CREATE TABLE parsed (
+        key TEXT PRIMARY KEY,
+        generator TEXT NOT NULL,
+        record BLOB NOT NULL
+    )""",
+]
+ARTIFACT_FIELDS = ["path", "mtime", "size", "debug_mtime", "debug_size", "source", "contract", "abi_hash", "build_info"]
+SOURCE_FIELDS = ["path", "file", "mtime", "size", "content_hash", "imports"]
+
+def hash_bytes(data):
+    return hashlib.sha1(data).hexdigest()
+
+def hash_json(value):
+    return hash_bytes(bytes(json.dumps(value, sort_keys=True), "UTF-8"))
+
+# Returns the modification time and size of the file, or None if it doesn't exist.
+def file_stats(path):
+    try:
+        details = stat(path)
+    except OSError:
+        return None
+    return details.st_mtime_ns, details.st_size
+
+# Returns the modification time and size of the artifact and of its debug file (or None for those of a missing debug
+# file), or None if the artifact doesn't exist. A recompilation may only rewrite the debug file, to point the artifact
+# at a new build info.
+def artifact_stats(path):
+    stats = file_stats(path)
+    if stats is None:
+        return None
+    return stats + (file_stats(path[:-5] + ".dbg.json") or (None, None))
+
+# The contracts parsed by generate_abi_typings.py and flatten_all.py, in one file. generate_abi_typings.py records the
+# compiled artifacts (by artifact path) and its serialized, parsed ABIs, and flatten_all.py the Solidity sources (by
+# source name), each with the modification time and size they were last parsed at. A tool only needs to re-parse the
+# entries whose file changed since then. Neither tool reads the other's tables: the build info that the artifacts come
+# from is a snapshot of the sources at compile time, not of the files that are flattened.
+#
+# The store is in WAL mode, so that one tool can read it while the other writes. Writes still lock the whole store, so the
+# tools commit each change as they make it rather than at the end of a run.
+#
+# A read only store works on an in-memory copy of the store (or an empty one, if there isn't one yet), so that the tools
+# can run as usual without writing anything back.
+class ContractStore:
+    def __init__(self, path=STORE_FILE, read_only=False):
+        if read_only:
+            self.connection = sqlite3.connect(":memory:")
+            if exists(path):
+                source = sqlite3.connect("file:%s?mode=ro" % pathname2url(abspath(path)), uri=True, timeout=30)
+                try:
+                    source.backup(self.connection)
+                finally:
+                    source.close()
+        else:
+            self.connection = sqlite3.connect(path, timeout=30)
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.row_factory = sqlite3.Row
+
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            for table in ["artifacts", "sources", "parsed"]:
+                self.connection.execute("DROP TABLE IF EXISTS %s" % table)
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+            self.connection.execute("PRAGMA user_version = %s" % SCHEMA_VERSION)
+            self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def commit(self):
+        self.connection.commit()
+
+    #############
+    # Artifacts #
+    #############
+
+    def artifacts(self):
+        rows = {}
+        for row in self.connection.execute("SELECT * FROM artifacts"):
+            rows[row["path"]] = dict(row)
+        return rows
+
+    # Walks the artifacts, returning the sorted paths of those that match the filter and the stats of those that
+    # changed since they were last recorded. Artifacts that no longer exist are forgotten.
+    def scan_artifacts(self, root, is_artifact):
+        recorded = {}
+        for row in self.connection.execute("SELECT path, mtime, size, debug_mtime, debug_size FROM artifacts"):
+            recorded[row["path"]] = (row["mtime"], row["size"], row["debug_mtime"], row["debug_size"])
+
+        paths = []
+        changed = {}
+        for directory, dirs, files in walk(root):
+            dirs.sort()
+            for f in sorted(files):
+                path = join(directory, f)
+                if not is_artifact(path):
+                    continue
+
+                stats = artifact_stats(path)
+                if stats is None:
+                    continue
+                paths.append(path)
+                if recorded.pop(path, None) != stats:
+                    changed[path] = stats
+
+        self.connection.executemany("DELETE FROM artifacts WHERE path = ?", [(_,) for _ in recorded])
+        return paths, changed
+
+    def update_artifact(self, row):
+        self.connection.execute(
+            "REPLACE INTO artifacts (%s) VALUES (%s)" % (", ".join(ARTIFACT_FIELDS), ", ".join(["?"] * len(ARTIFACT_FIELDS))),
+            [row[_] for _ in ARTIFACT_FIELDS],
+        )
+
+    ###########
+    # Sources #
+    ###########
+
+    def sources(self):
+        rows = {}
+        for row in self.connection.execute("SELECT * FROM sources"):
+            row = dict(row)
+            row["imports"] = [_ for _ in row["imports"].split("\n") if _ != ""]
+            rows[row["path"]] = row
+        return rows
+
+    def update_source(self, row):
+        row = dict(row, imports="\n".join(row["imports"]))
+        self.connection.execute(
+            "REPLACE INTO sources (%s) VALUES (%s)" % (", ".join(SOURCE_FIELDS), ", ".join(["?"] * len(SOURCE_FIELDS))),
+            [row[_] for _ in SOURCE_FIELDS],
+        )
+
+    ##########
+    # Parsed #
+    ##########
+
+    # Returns the serialized record stored under the key by the given generator, or None.
+    def parsed(self, key, generator):
+        row = self.connection.execute("SELECT record FROM parsed WHERE key = ? AND generator = ?", (key, generator)).fetchone()
+        return None if row is None else row["record"]
+
+    def update_parsed(self, key, generator, record):
+        self.connection.execute("REPLACE INTO parsed (key, generator, record) VALUES (?, ?, ?)", (key, generator, record))
+
+    # Forgets the records that aren't in the keys or weren't stored by the given generator.
+    def prune_parsed(self, keys, generator):
+        stale = []
+        for row in self.connection.execute("SELECT key, generator FROM parsed"):
+            if row["key"] not in keys or row["generator"] != generator:
+                stale.append((row["key"],))
+        self.connection.executemany("DELETE FROM parsed WHERE key = ?", stale)
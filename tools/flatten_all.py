@@ -1,6 +1,18 @@
-from os import listdir, makedirs, rmdir, stat, unlink, walk
-from os.path import exists, join, sep
-from subprocess import run, PIPE
+import json
+import re
+import threading
+from argparse import ArgumentParser
+from os import cpu_count, getpid, listdir, makedirs, replace, rmdir, unlink, walk
+from os.path import abspath, dirname, exists, join, normpath, sep
+from posixpath import join as join_source, normpath as normpath_source
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
+from subprocess import Popen, PIPE
+from sys import exit
+
+from contract_store import ContractStore, file_stats
+from phase_stats import Stats
+from watcher import watch
 
 SRC_ROOT = "contracts"
 DEST_ROOT = "flattened"
@@ -13,169 +25,641 @@ HARDHAT = "// Sources flattened with hardhat"
 CACHE_FILE = "tools/.flattencache"
 CACHE_SEP = "\0\0"
 SKIP = ["%s/openzeppelin" % SRC_ROOT]
+NODE_MODULES = "node_modules"
+HARDHAT_HELPER_SCRIPT = join(dirname(__file__), "flatten_helper.js")
+
+# Matches an entire import statement (the same pattern hardhat uses to strip them), and the path it imports.
+IMPORT_RE = re.compile(r"^\s*import(\s+)[\s\S]*?;\s*$", re.M)
+IMPORT_PATH_RE = re.compile(r"[\"']([^\"']+)[\"']")
 
+# The import closure each file was last flattened with, and the hash of what was written for it.
 CACHED_PATHS = {}
+CACHED_OUTPUTS = {}
 FLATTENED_FILES = {}
 
-def flatten(root, file):
-    if root in SKIP:
+# Timings of each phase, if enabled with --stats.
+STATS = Stats()
+PHASES = ["cache read", "flatten", "post-processing", "write", "cleanup"]
+
+# Cache of source names to the source names they import and the hash of their contents, and to their import-stripped
+# contents. Sources that haven't changed since they were recorded in the store aren't read unless they are flattened.
+CACHED_SOURCES = {}
+CACHED_BODIES = {}
+
+# The store of parsed sources, the sources it held at startup and the names of those read since then. The store
+# is only written from the main thread (see save_sources).
+STORE = None
+STORED_SOURCES = {}
+UNSAVED_SOURCES = set()
+
+# The number of files to flatten at once.
+JOBS = 1
+
+# If the flattened files are only checked against what would be generated, with --check. Nothing is written: the store
+# is an in-memory copy, and the suspect files are flattened in memory.
+CHECK = False
+
+# The number of files --check flattens at once by default.
+CHECK_JOBS = 4
+
+# If the hardhat flattener should be used instead of our own.
+USE_HARDHAT = False
+
+# The idle node processes that flatten with hardhat (see flatten_helper.js). They are started as needed, at most one per
+# job, and kept for the rest of the run so that hardhat only has to start once for each.
+HARDHAT_HELPERS = []
+HARDHAT_HELPERS_LOCK = threading.Lock()
+
+# Returns the file path for the given source name, looking in node_modules for library sources.
+def resolve_file(source_name):
+    if exists(source_name):
+        return source_name
+
+    # Look for the library in every node_modules up to the root, like node does.
+    directory = abspath(".")
+    while True:
+        path = join(directory, NODE_MODULES, normpath(source_name))
+        if exists(path):
+            return path
+        if dirname(directory) == directory:
+            break
+        directory = dirname(directory)
+
+    raise Exception("Could not resolve import: %s" % source_name)
+
+# Returns the source names the given source imports and the hash of its contents, from the store if the file hasn't
+# changed since it was recorded there.
+def source_info(source_name):
+    if source_name in CACHED_SOURCES:
+        return CACHED_SOURCES[source_name]
+
+    file = resolve_file(source_name)
+    row = STORED_SOURCES.get(source_name)
+    if row is not None and row["file"] == file and (row["mtime"], row["size"]) == file_stats(file):
+        CACHED_SOURCES[source_name] = (row["imports"], row["content_hash"])
+        return CACHED_SOURCES[source_name]
+
+    read_source(source_name)
+    return CACHED_SOURCES[source_name]
+
+# Reads the given source, stripping its imports and resolving them to source names. The result is cached so that
+# shared dependencies are only read once per run.
+def read_source(source_name):
+    if source_name in CACHED_BODIES:
+        return CACHED_BODIES[source_name]
+
+    file = resolve_file(source_name)
+    stats = file_stats(file)
+    with open(file, "rb") as f:
+        raw = f.read()
+    content = raw.decode("utf-8")
+
+    imports = []
+    for statement in IMPORT_RE.finditer(content):
+        match = IMPORT_PATH_RE.search(statement.group(0))
+        if match is None:
+            continue
+
+        path = match.group(1)
+        if path.startswith("./") or path.startswith("../"):
+            path = normpath_source(join_source(source_name.rsplit("/", 1)[0], path))
+        imports.append(path)
+
+    CACHED_SOURCES[source_name] = (imports, sha1(raw).hexdigest())
+    CACHED_BODIES[source_name] = IMPORT_RE.sub("", content).strip()
+
+    # Record it so the next run can skip reading it if it doesn't change.
+    if stats is not None:
+        STORED_SOURCES[source_name] = {
+            "path" : source_name,
+            "file" : file,
+            "mtime" : stats[0],
+            "size" : stats[1],
+            "content_hash" : CACHED_SOURCES[source_name][1],
+            "imports" : imports,
+        }
+        UNSAVED_SOURCES.add(source_name)
+
+    return CACHED_BODIES[source_name]
+
+# Records the sources read since the last call in the store.
+def save_sources():
+    for source_name in sorted(UNSAVED_SOURCES):
+        STORE.update_source(STORED_SOURCES[source_name])
+    UNSAVED_SOURCES.clear()
+
+# Returns the source names the given source depends on, with every dependency before its dependents, in the same order
+# as hardhat's flatten task. Hardhat sorts the graph of each source's dependents with tsort: a reverse post-order, with
+# the sources in the order they were resolved. Cyclic imports are rejected, as they are by hardhat.
+def sort_sources(source_name):
+    dependencies = {}
+    resolve_dependencies(source_name, dependencies)
+
+    # Build the graph of dependents, adding the sources in the order tsort sees them.
+    dependents = {}
+    for dependent, imports in dependencies.items():
+        for dependency in imports:
+            dependents.setdefault(dependency, [])
+            dependents.setdefault(dependent, [])
+            if dependent not in dependents[dependency]:
+                dependents[dependency].append(dependent)
+
+    sorted_sources = []
+    visited = {}
+    for name in dependents:
+        visit_dependents(name, dependents, visited, [], sorted_sources)
+    sorted_sources.reverse()
+
+    # A source without any imports isn't in the graph.
+    for name in dependencies:
+        if name not in visited:
+            sorted_sources.append(name)
+
+    return sorted_sources
+
+# Resolves the imports of the given source and everything it imports, in the order hardhat does: each source before
+# its imports, which are resolved in order.
+def resolve_dependencies(source_name, dependencies):
+    if source_name in dependencies:
+        return
+
+    imports = []
+    for dependency in source_info(source_name)[0]:
+        if dependency not in imports:
+            imports.append(dependency)
+    dependencies[source_name] = imports
+
+    for dependency in imports:
+        resolve_dependencies(dependency, dependencies)
+
+# Visits the source and its dependents depth first, adding each source to the sorted sources after its dependents.
+def visit_dependents(source_name, dependents, visited, path, sorted_sources):
+    if source_name in path:
+        raise Exception("Cyclic imports between: %s" % ", ".join(path[path.index(source_name):]))
+    if source_name in visited:
         return
 
+    visited[source_name] = 1
+    for dependent in dependents[source_name]:
+        visit_dependents(dependent, dependents, visited, path + [source_name], sorted_sources)
+    sorted_sources.append(source_name)
+
+# Returns the source names and content hashes of the given source and everything it (transitively) imports.
+# Returns None if the imports could not be resolved.
+def get_closure(src):
+    try:
+        return [(source_name, source_info(source_name)[1]) for source_name in sorted(sort_sources(src.replace(sep, "/")))]
+    except Exception:
+        return None
+
+# Flattens the given source in the same format as hardhat's flatten task.
+def flatten_source(src):
+    flattened = HARDHAT
+    for source_name in sort_sources(src.replace(sep, "/")):
+        flattened += "\n\n%s%s" % (FILE_IMPORT, source_name)
+        flattened += "\n\n%s\n" % read_source(source_name)
+
+    return flattened.strip()
+
+# Flattens the given source with hardhat, through an idle helper process.
+def hardhat_flatten(src):
+    with HARDHAT_HELPERS_LOCK:
+        helper = HARDHAT_HELPERS.pop() if len(HARDHAT_HELPERS) > 0 else None
+    if helper is None:
+        helper = Popen(["node", HARDHAT_HELPER_SCRIPT], stdin=PIPE, stdout=PIPE, encoding="utf-8")
+
+    helper.stdin.write(json.dumps(src.replace(sep, "/")) + "\n")
+    helper.stdin.flush()
+    while True:
+        line = helper.stdout.readline()
+        if line == "":
+            helper.wait()
+            raise Exception("The hardhat helper exited unexpectedly")
+
+        # Skip anything hardhat itself logs.
+        if line[:1] == "{":
+            break
+
+    with HARDHAT_HELPERS_LOCK:
+        HARDHAT_HELPERS.append(helper)
+
+    response = json.loads(line)
+    if "error" in response:
+        raise Exception(response["error"])
+    return response["flattened"]
+
+def stop_hardhat_helpers():
+    with HARDHAT_HELPERS_LOCK:
+        for helper in HARDHAT_HELPERS:
+            helper.stdin.close()
+            helper.wait()
+        HARDHAT_HELPERS.clear()
+
+# Returns the source, destination and import closure of the given file if it needs to be flattened, or None if it is
+# up to date.
+def find_stale(root, file):
+    if root in SKIP:
+        return None
+
     # Build the paths
     src = join(SRC_ROOT, root, file + SRC_SUFFIX)
     dest_dir = join(DEST_ROOT, root)
     dest = join(dest_dir, file + DEST_SUFFIX)
 
     # Make all necessary directories
-    makedirs(dest_dir, exist_ok=True)
+    if not CHECK:
+        makedirs(dest_dir, exist_ok=True)
 
     # Track the file so we don't remove it later, even if there was a failure in flattening.
     FLATTENED_FILES[dest] = 1
 
-    # Check to see if it's been modified.
-    modified = str(stat(src).st_mtime)
-    if exists(dest) and src in CACHED_PATHS and CACHED_PATHS[src] == modified:
-        print("Skipped: %s" % src)
-        return
+    # Check to see if it or anything it imports has been modified, and that the file is still what was written for it.
+    with STATS.phase("cache read", src):
+        closure = get_closure(src)
+        fresh = closure is not None and src in CACHED_PATHS and CACHED_PATHS[src] == closure
+        if fresh and hash_file(dest) == CACHED_OUTPUTS[src]:
+            if not CHECK:
+                print("Skipped: %s" % src)
+            return None
 
-    # Flatten the file
-    try:
-        #p = Popen("yarn", args=["hardhat", "flatten", src, ">", dest])
-        #p.wait()
-        #system("yarn hardhat flatten %s > %s" % (src, dest))
-        p = run(["yarn", "--silent", "hardhat", "flatten", src], shell=True, stdout=PIPE)
-        flattened = p.stdout.decode("utf-8")
-    except Exception as e:
-        print("Could not flatten: %s" % src)
-        print(e)
+    return src, dest, closure
+
+# Runs the function on each of the jobs, up to JOBS at a time, yielding the results in order.
+def run_jobs(function, jobs):
+    if JOBS <= 1 or len(jobs) <= 1:
+        yield from map(lambda job: function(*job), jobs)
         return
 
-    # Find the first license identifier and solidity version pragma in the source file copy it to the head of the
-    # flattened file, removing all others.
-    license = ""
-    version = ""
-    with open(src) as f:
-        for line in f.readlines():
-            # We are strict about the format of the identifier.
-            if line[:len(LICENSE_IDENTIFIER)] == LICENSE_IDENTIFIER:
-                license = line.rstrip()
-            if line[:len(SOLIDITY_VERSION)] == SOLIDITY_VERSION:
-                version = line.rstrip()
+    with ThreadPoolExecutor(max_workers=JOBS) as executor:
+        yield from executor.map(lambda job: function(*job), jobs)
 
-            if license != "" and version != "":
-                break
+# Flattens the stale files, as found by find_stale, up to JOBS at a time. The logs and cache updates are applied in
+# order from the main thread, so the output doesn't depend on which file finishes first.
+def flatten_stale(stale):
+    for (src, dest, closure), (log, output_hash) in zip(stale, run_jobs(flatten_file, stale)):
+        for line in log:
+            print(line)
 
-    # Remove all duplicate identifiers / version pragmas from the flattened file.
-    out_lines = []
-    empty_count = 0
-    for line in flattened.split("\n"):
-        # Skip duplicate identifiers / version pragmas.
-        if line[:len(LICENSE_IDENTIFIER)] == LICENSE_IDENTIFIER:
-            continue
-        if line[:len(SOLIDITY_VERSION)] == SOLIDITY_VERSION:
+        # Update the cache
+        if output_hash is None:
             continue
-        # Skip hardhat's comment.
-        if line[:len(HARDHAT)] == HARDHAT:
-            continue
-        # Skip the file import comments. We want to preserve the spacing with an empty line.
-        if line[:len(FILE_IMPORT)] == FILE_IMPORT:
-            out_lines.append("")
-            continue
-
-        # Preserve all others, removing duplicate adjacent empty lines
-        if line.strip() == "":
-            empty_count += 1
-            if empty_count > 1:
-                continue
+        if closure is not None:
+            CACHED_PATHS[src] = closure
+            CACHED_OUTPUTS[src] = output_hash
         else:
-            empty_count = 0
-        out_lines.append(line.rstrip())
+            CACHED_PATHS.pop(src, None)
+            CACHED_OUTPUTS.pop(src, None)
 
-    # Prepend the original license and version.
-    if version != "":
-        out_lines.insert(0, version)
-    if license != "":
-        out_lines.insert(0, license)
+# Flattens the given source, natively or with hardhat.
+def flatten(src):
+    with STATS.phase("flatten", src):
+        if USE_HARDHAT:
+            return hardhat_flatten(src)
+        return flatten_source(src)
 
-    # Write out the changes.
-    with open(dest, "w") as f:
-        f.write("\n".join(out_lines))
+# Flattens a stale file and writes it out. Returns the lines to log and the hash of what was written, or None if it
+# couldn't be flattened.
+def flatten_file(src, dest, closure):
+    try:
+        flattened = flatten(src)
+    except Exception as e:
+        return ["Could not flatten: %s" % src, str(e)], None
 
-    # Update the cache
-    CACHED_PATHS[src] = modified
+    contents, warnings = post_process(src, flattened)
+
+    # Write out the changes.
+    with STATS.phase("write", src):
+        written = write_if_changed(dest, contents)
 
     # Log it
-    print("Updated: %s" % src)
+    return ["%s: %s" % ("Updated" if written else "Unchanged", src)] + warnings, hash_contents(contents)
+
+# Flattens a suspect file in memory, as found by find_stale with --check. Returns the lines to log and if the file on
+# disk matches.
+def check_file(src, dest, closure):
+    try:
+        flattened = flatten(src)
+    except Exception as e:
+        return ["Could not flatten: %s" % src, str(e)], False
+
+    contents = post_process(src, flattened)[0]
+    return [], hash_file(dest) == hash_contents(contents)
+
+# Returns the flattened file, with only the license identifier and solidity version pragma of the original source, and
+# the warnings to log about it.
+def post_process(src, flattened):
+    with STATS.phase("post-processing", src):
+        # Find the first license identifier and solidity version pragma in the source file copy it to the head of the
+        # flattened file, removing all others.
+        license = ""
+        version = ""
+        with open(src) as f:
+            for line in f.readlines():
+                # We are strict about the format of the identifier.
+                if line[:len(LICENSE_IDENTIFIER)] == LICENSE_IDENTIFIER:
+                    license = line.rstrip()
+                if line[:len(SOLIDITY_VERSION)] == SOLIDITY_VERSION:
+                    version = line.rstrip()
+
+                if license != "" and version != "":
+                    break
+
+        # Remove all duplicate identifiers / version pragmas from the flattened file.
+        out_lines = []
+        empty_count = 0
+        for line in flattened.split("\n"):
+            # Skip duplicate identifiers / version pragmas.
+            if line[:len(LICENSE_IDENTIFIER)] == LICENSE_IDENTIFIER:
+                continue
+            if line[:len(SOLIDITY_VERSION)] == SOLIDITY_VERSION:
+                continue
+            # Skip hardhat's comment.
+            if line[:len(HARDHAT)] == HARDHAT:
+                continue
+            # Skip the file import comments. We want to preserve the spacing with an empty line.
+            if line[:len(FILE_IMPORT)] == FILE_IMPORT:
+                out_lines.append("")
+                continue
+
+            # Preserve all others, removing duplicate adjacent empty lines
+            if line.strip() == "":
+                empty_count += 1
+                if empty_count > 1:
+                    continue
+            else:
+                empty_count = 0
+            out_lines.append(line.rstrip())
+
+        # Prepend the original license and version.
+        if version != "":
+            out_lines.insert(0, version)
+        if license != "":
+            out_lines.insert(0, license)
+
+    warnings = []
     if license == "":
-        print("  WARNING: No SPDX identifier.")
+        warnings.append("  WARNING: No SPDX identifier.")
     if version == "":
-        print("  WARNING: No solidity pragma.")
+        warnings.append("  WARNING: No solidity pragma.")
+    return "\n".join(out_lines), warnings
+
+def hash_contents(contents):
+    return sha1(contents.encode("utf-8")).hexdigest()
+
+# Returns the hash of the file's contents, or None if it doesn't exist.
+def hash_file(path):
+    if not exists(path):
+        return None
+    with open(path, "rb") as f:
+        return sha1(f.read()).hexdigest()
+
+# Writes the contents to the given path if they differ from what is already there, so that an identical re-flatten
+# doesn't touch the file. The new file is written next to it and renamed over it, so it is never seen half-written.
+# The contents are written as UTF-8 with "\n" line endings on every platform, so the file hashes the same as the contents.
+# Returns True if the file was written.
+def write_if_changed(path, contents):
+    data = contents.encode("utf-8")
+    if exists(path):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+
+    temp_path = "%s.%s.tmp" % (path, getpid())
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        replace(temp_path, path)
+    except BaseException:
+        if exists(temp_path):
+            unlink(temp_path)
+        raise
+
+    return True
+
+# Read the cache of previously flattened files (the hash of what was written and the content hashes of their imports)
+# so we know which ones we could skip.
+def read_cache():
+    if exists(CACHE_FILE):
+        with open(CACHE_FILE) as f:
+            for line in f.read().split("\n"):
+                fields = line.split(CACHE_SEP)
+                closure = [tuple(_.split("\0")) for _ in fields[2:]]
+
+                # Skip entries from older versions of the cache.
+                if len(fields) < 2 or "\0" in fields[1]:
+                    continue
+                if len(closure) == 0 or any(len(_) != 2 for _ in closure):
+                    continue
+                CACHED_PATHS[fields[0]] = closure
+                CACHED_OUTPUTS[fields[0]] = fields[1]
 
-# Read the cache of previously flattened files so we know which ones we could skip.
-if exists(CACHE_FILE):
-    with open(CACHE_FILE) as f:
-        for line in f.readlines():
-            path, mtime = line.strip().split(CACHE_SEP)
-            CACHED_PATHS[path] = mtime
+# Returns the files that need to be flattened, as found by find_stale.
+def find_all_stale():
+    stale = []
+    for root, dirs, files in walk(SRC_ROOT):
+        for file in files:
+            if file[-len(SRC_SUFFIX):] == SRC_SUFFIX:
+                job = find_stale(root[len(SRC_ROOT)+1:], file[:-len(SRC_SUFFIX)])
+                if job is not None:
+                    stale.append(job)
+
+    return stale
 
 # Flatten all files.
-for root, dirs, files in walk(SRC_ROOT):
-    for file in files:
-        if file[-len(SRC_SUFFIX):] == SRC_SUFFIX:
-            flatten(root[len(SRC_ROOT)+1:], file[:-len(SRC_SUFFIX)])
+def flatten_all():
+    flatten_stale(find_all_stale())
 
-# Update the cache
-with open(CACHE_FILE, "w") as f:
-    lines = []
+# Checks the flattened files without writing anything, re-flattening only the suspect ones in memory. Returns the
+# flattened files that are missing or out of date, and those that would be deleted.
+def check_all():
+    suspect = find_all_stale()
+    stale = []
+    for (src, dest, closure), (log, matches) in zip(suspect, run_jobs(check_file, suspect)):
+        for line in log:
+            print(line)
+        if not matches:
+            stale.append(dest)
+
+    for root, dirs, files in walk(DEST_ROOT):
+        for file in files:
+            path = join(root, file)
+            if path not in FLATTENED_FILES:
+                stale.append(path)
+
+    return sorted(stale)
+
+# Reports the flattened files that --check found to be stale, exiting with an error if there are any.
+def report_check(stale):
+    if len(stale) == 0:
+        print("All %s flattened files are up to date" % len(FLATTENED_FILES))
+        return
+
+    for path in stale:
+        print("Stale: %s" % path)
+    print("%s flattened files are stale, run `yarn flatten` to update them" % len(stale))
+    exit(1)
+
+# Re-flattens only the files affected by the changed sources reported by the watcher.
+def flatten_changed(changed):
+    changed_sources = {}
+    for path in changed:
+        source_name = path.replace(sep, "/")
+        changed_sources[source_name] = 1
+        CACHED_SOURCES.pop(source_name, None)
+        CACHED_BODIES.pop(source_name, None)
+
+    # Find every file that is either itself changed or imports a changed source.
+    affected = {}
+    for path in changed:
+        affected[path] = 1
     for path in CACHED_PATHS:
-        lines.append("%s%s%s" % (path, CACHE_SEP, CACHED_PATHS[path]))
-    f.write("\n".join(lines))
+        for source_name, _ in CACHED_PATHS[path]:
+            if source_name in changed_sources:
+                affected[path] = 1
+                break
+
+    stale = []
+    for path in sorted(affected.keys()):
+        root = dirname(path)[len(SRC_ROOT)+1:]
+        file = path[len(dirname(path))+1:-len(SRC_SUFFIX)]
+        if exists(path):
+            job = find_stale(root, file)
+            if job is not None:
+                stale.append(job)
+        else:
+            # It was removed, so its flattened file will be too.
+            CACHED_PATHS.pop(path, None)
+            CACHED_OUTPUTS.pop(path, None)
+            FLATTENED_FILES.pop(join(DEST_ROOT, root, file + DEST_SUFFIX), None)
+    flatten_stale(stale)
+
+    with STATS.phase("cleanup"):
+        save_sources()
+        STORE.commit()
+        write_cache()
+        remove_stale()
+    report_stats()
+
+def report_stats(stats_json=None):
+    if not STATS.enabled:
+        return
+
+    STATS.report(PHASES)
+    if stats_json is not None:
+        STATS.write(stats_json)
+    STATS.reset()
+
+# Update the cache
+def write_cache():
+    with open(CACHE_FILE, "w") as f:
+        lines = []
+        for path in CACHED_PATHS:
+            closure = ["\0".join(_) for _ in CACHED_PATHS[path]]
+            lines.append(CACHE_SEP.join([path, CACHED_OUTPUTS[path]] + closure))
+        f.write("\n".join(lines))
 
 # Remove all flattened files that we didn't just generate.
-empty_dirs = []
-for root, dirs, files in walk(DEST_ROOT):
-    removed_count = 0
-    for file in files:
-        path = join(root, file)
-        if path not in FLATTENED_FILES:
-            try:
-                unlink(path)
-            except Exception as e:
-                print("Could not delete: %s" % path)
-                print(e)
+def remove_stale():
+    empty_dirs = []
+    for root, dirs, files in walk(DEST_ROOT):
+        removed_count = 0
+        for file in files:
+            path = join(root, file)
+            if path not in FLATTENED_FILES:
+                try:
+                    unlink(path)
+                except Exception as e:
+                    print("Could not delete: %s" % path)
+                    print(e)
+                    continue
+
+                removed_count += 1
+                print("Deleted: %s" % path)
+
+        # Keep track of the empty dir (in reverse order).
+        if removed_count == len(files):
+            empty_dirs.insert(0, root)
+
+    # Remove all empty directories.
+    removed_dirs = {}
+    for dir in empty_dirs:
+        # We don't want to remove the root dir.
+        if dir == DEST_ROOT:
+            break
+
+        # Remove the dir and all empty parent dirs.
+        pieces = dir.split(sep)
+        for i in range(len(pieces) - 1):
+            parent_dir = join(DEST_ROOT, *pieces[1:len(pieces) - i])
+
+            # Make sure we haven't already removed this dir.
+            if parent_dir in removed_dirs:
                 continue
 
-            removed_count += 1
-            print("Deleted: %s" % path)
+            if len(listdir(parent_dir)) == 0:
+                # Try and remove the dir.
+                try:
+                    rmdir(parent_dir)
+                except Exception as e:
+                    print("Could not remove empty dir: %s" % parent_dir)
+                    print(e)
+                    break
 
-    # Keep track of the empty dir (in reverse order).
-    if removed_count == len(files):
-        empty_dirs.insert(0, root)
+                removed_dirs[parent_dir] = 1
+                print("Removed: %s" % parent_dir)
 
-# Remove all empty directories.
-removed_dirs = {}
-for dir in empty_dirs:
-    # We don't want to remove the root dir.
-    if dir == DEST_ROOT:
-        break
+def main():
+    global USE_HARDHAT, JOBS, CHECK, STORE, STORED_SOURCES
 
-    # Remove the dir and all empty parent dirs.
-    pieces = dir.split(sep)
-    for i in range(len(pieces) - 1):
-        parent_dir = join(DEST_ROOT, *pieces[1:len(pieces) - i])
+    parser = ArgumentParser(description="Generates flattened, single-source copies of the contracts.")
+    parser.add_argument("--hardhat", action="store_true", help="flatten with `hardhat flatten` instead of natively")
+    parser.add_argument("--jobs", "-j", type=int,
+        help="the number of files to flatten at once (default: 1, or up to %s with --check)" % CHECK_JOBS)
+    parser.add_argument("--watch", "-w", action="store_true", help="keep running, re-flattening as sources change")
+    parser.add_argument("--stats", "--profile", action="store_true", help="print the time spent in each phase")
+    parser.add_argument("--stats-json", help="also write the time spent in each phase to this file")
+    parser.add_argument("--check", action="store_true",
+        help="only check that the flattened files are up to date, listing those that aren't and failing if there are any, without writing anything")
+    args = parser.parse_args()
+    if args.check and args.watch:
+        parser.error("--check can't be used with --watch")
+    USE_HARDHAT = args.hardhat
+    CHECK = args.check
+    if args.jobs is None:
+        JOBS = min(CHECK_JOBS, cpu_count() or 1) if CHECK else 1
+    else:
+        JOBS = max(1, args.jobs)
 
-        # Make sure we haven't already removed this dir.
-        if parent_dir in removed_dirs:
-            continue
+    STATS.enabled = args.stats or args.stats_json is not None
 
-        if len(listdir(parent_dir)) == 0:
-            # Try and remove the dir.
+    STORE = ContractStore(read_only=CHECK)
+    try:
+        with STATS.phase("cache read"):
+            read_cache()
+            STORED_SOURCES = STORE.sources()
+        if CHECK:
+            stale = check_all()
+            report_stats(args.stats_json)
+            report_check(stale)
+            return
+
+        flatten_all()
+        with STATS.phase("cleanup"):
+            save_sources()
+            STORE.commit()
+            write_cache()
+            remove_stale()
+        report_stats(args.stats_json)
+
+        # The parsed sources and their imports are kept in memory, so only the changed sources need to be read again.
+        if args.watch:
             try:
-                rmdir(parent_dir)
-            except Exception as e:
-                print("Could not remove empty dir: %s" % parent_dir)
-                print(e)
-                break
+                watch([SRC_ROOT], [SRC_SUFFIX], flatten_changed)
+            except KeyboardInterrupt:
+                pass
+    finally:
+        stop_hardhat_helpers()
+        STORE.close()
 
-            removed_dirs[parent_dir] = 1
-            print("Removed: %s" % parent_dir)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+/**
+ * Flattens sources with hardhat for `tools/flatten_all.py --hardhat`, so that hardhat only starts once per run rather
+ * than once per source. Reads one JSON-encoded source path per line from stdin, and writes one JSON line per source to
+ * stdout with either the flattened source or the error.
+ */
+const readline = require("readline");
+const hre = require("hardhat");
+const { TASK_FLATTEN_GET_FLATTENED_SOURCE } = require("hardhat/builtin-tasks/task-names");
+
+async function main() {
+    const lines = readline.createInterface({
+        input : process.stdin,
+        terminal : false,
+    });
+
+    for await (const line of lines) {
+        if (line.trim() === "") {
+            continue;
+        }
+
+        const file = JSON.parse(line);
+        let response;
+        try {
+            const flattened = await hre.run(TASK_FLATTEN_GET_FLATTENED_SOURCE, { files : [file] });
+            response = {
+                file,
+                flattened,
+            };
+        } catch (e) {
+            response = {
+                file,
+                error : e.message,
+            };
+        }
+        process.stdout.write(`${JSON.stringify(response)}\n`);
+    }
+}
+
+main().catch((e) => {
+    console.error(e);
+    process.exit(1);
+});
@@ -0,0 +1,444 @@
+import argparse
+import fnmatch
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from subprocess import DEVNULL, PIPE, run
+
+from generate_abi_typings import ARTIFACTS_DIR, canonicalSignature, hashSignature, isArtifact
+
+# Records the gas used by each contract method and deployment, as measured by hardhat-gas-reporter during the tests,
+# so that changes can be compared against a baseline run. The reporter's output can be given either as the JSON it
+# writes with `outputJSON`, or as the text table it prints at the end of `yarn test` (which can be piped in with -).
+
+HISTORY_FILE = "tools/.gashistory.sqlite"
+DEFAULT_REPORT = "gasReporterOutput.json"
+
+# Bump this whenever the tables change. Unlike the caches, the history can't be rebuilt, so older versions need to be
+# migrated rather than dropped.
+SCHEMA_VERSION = 1
+SCHEMA = [
+    """CREATE TABLE runs (
+        id INTEGER PRIMARY KEY,
+        created INTEGER NOT NULL,
+        label TEXT,
+        git_commit TEXT
+    )""",
+    """CREATE TABLE methods (
+        run INTEGER NOT NULL,
+        contract TEXT NOT NULL,
+        signature TEXT NOT NULL,
+        selector TEXT,
+        calls INTEGER NOT NULL,
+        min INTEGER NOT NULL,
+        max INTEGER NOT NULL,
+        avg INTEGER NOT NULL,
+        PRIMARY KEY (run, contract, signature)
+    )""",
+    """CREATE TABLE deployments (
+        run INTEGER NOT NULL,
+        contract TEXT NOT NULL,
+        calls INTEGER NOT NULL,
+        min INTEGER NOT NULL,
+        max INTEGER NOT NULL,
+        avg INTEGER NOT NULL,
+        size INTEGER,
+        PRIMARY KEY (run, contract)
+    )""",
+]
+
+# The gas reporter colors its table unless told otherwise.
+ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+# The lines printed by logGas() in tests/utils.ts.
+LOG_GAS_RE = re.compile(r"^\t(\w+)\(\): (\d+) \$")
+LOG_GAS_CONTRACT = "(logGas)"
+
+# The largest deployed contract allowed by EIP-170.
+MAX_CONTRACT_SIZE = 24576
+
+###########
+# Reports #
+###########
+
+# A measurement of a method or deployment: the gas used by each call (or just the summary, from the text table).
+def measurement(gas_data=None, calls=None, minimum=None, maximum=None, average=None):
+    if gas_data is not None and len(gas_data) > 0:
+        return {
+            "calls" : len(gas_data),
+            "min" : min(gas_data),
+            "max" : max(gas_data),
+            "avg" : round(sum(gas_data) / len(gas_data)),
+        }
+    return {
+        "calls" : calls,
+        "min" : average if minimum is None else minimum,
+        "max" : average if maximum is None else maximum,
+        "avg" : average,
+    }
+
+# Reads the JSON written by the gas reporter with `outputJSON`. Returns the measured methods, by contract and
+# signature, and deployments, by contract (with the size of the deployed bytecode).
+def read_json_report(path):
+    with open(path) as f:
+        report = json.load(f)
+
+    methods = {}
+    deployments = {}
+    info = report.get("info", report)
+    for method in info.get("methods", {}).values():
+        if method.get("numberOfCalls", 0) == 0:
+            continue
+
+        signature = method.get("fnSig") or method["method"]
+        methods[(method["contract"], signature)] = measurement(method.get("gasData"))
+
+    for deployment in info.get("deployments", []):
+        if len(deployment.get("gasData", [])) == 0:
+            continue
+
+        deployments[deployment["name"]] = measurement(deployment["gasData"])
+        deployments[deployment["name"]]["size"] = bytecode_size(deployment.get("deployedBytecode"))
+
+    return methods, deployments
+
+# Reads the table printed by the gas reporter, and the lines printed by logGas(), from the test output. The methods are
+# only listed by signature with `showMethodSig`, otherwise they're matched to their signature by name when joining with
+# the artifacts.
+def read_text_report(lines, echo=False):
+    methods = {}
+    deployments = {}
+    section = None
+    for line in lines:
+        if echo:
+            sys.stdout.write(line)
+
+        line = ANSI_RE.sub("", line).rstrip("\r\n")
+        match = LOG_GAS_RE.match(line)
+        if match is not None:
+            methods[(LOG_GAS_CONTRACT, match.group(1))] = measurement(calls=1, average=int(match.group(2)))
+            continue
+
+        # Rows are framed by a pipe (or box drawing character), with the cells separated by middle dots.
+        line = line.strip()
+        if len(line) < 2 or line[0] != "|":
+            continue
+        cells = [_.strip() for _ in line[1:-1].split("·")]
+
+        if cells[0] in ("Methods", "Deployments"):
+            section = cells[0]
+        elif section == "Methods" and len(cells) >= 6 and is_number(cells[4]):
+            methods[(cells[0], cells[1])] = measurement(
+                calls=parse_number(cells[5]),
+                minimum=parse_number(cells[2]),
+                maximum=parse_number(cells[3]),
+                average=parse_number(cells[4]),
+            )
+        elif section == "Deployments" and len(cells) >= 4 and is_number(cells[3]):
+            deployments[cells[0]] = measurement(
+                calls=None,
+                minimum=parse_number(cells[1]),
+                maximum=parse_number(cells[2]),
+                average=parse_number(cells[3]),
+            )
+            deployments[cells[0]]["size"] = None
+
+    return methods, deployments
+
+def is_number(cell):
+    return re.match(r"^[0-9,]+$", cell) is not None
+
+# Returns the number in the cell, or None for a dash.
+def parse_number(cell):
+    return int(cell.replace(",", "")) if is_number(cell) else None
+
+def bytecode_size(bytecode):
+    if bytecode is None or len(bytecode) <= 2:
+        return None
+    return (len(bytecode) - 2) // 2
+
+#############
+# Artifacts #
+#############
+
+# Returns the selectors of each function of the given contracts, by signature, and the size of their deployed
+# bytecode, from their artifacts.
+def read_artifacts(contracts):
+    selectors = {}
+    sizes = {}
+    for directory, dirs, files in os.walk(ARTIFACTS_DIR):
+        dirs.sort()
+        for f in sorted(files):
+            path = os.path.join(directory, f)
+            contract = f[:-5]
+            if contract not in contracts or contract in selectors or not isArtifact(path):
+                continue
+
+            with open(path) as artifact_file:
+                artifact = json.load(artifact_file)
+
+            selectors[contract] = {}
+            for item in artifact.get("abi", []):
+                signature = canonicalSignature(item) if item.get("type") == "function" else None
+                if signature is not None:
+                    selectors[contract][signature] = "0x%s" % hashSignature(signature)[:4].hex()
+            sizes[contract] = bytecode_size(artifact.get("deployedBytecode"))
+
+    return selectors, sizes
+
+# Joins the measurements with the selectors from the artifacts. Methods that were only reported by name are renamed
+# to their signature, as long as the name isn't overloaded.
+def join_artifacts(methods, deployments):
+    selectors, sizes = read_artifacts(set([_[0] for _ in methods]) | set(deployments.keys()))
+
+    joined = {}
+    for (contract, signature), gas in sorted(methods.items()):
+        known = selectors.get(contract, {})
+        if signature not in known and "(" not in signature:
+            overloads = [_ for _ in known if _.split("(")[0] == signature]
+            if len(overloads) == 1:
+                signature = overloads[0]
+
+        joined[(contract, signature)] = dict(gas, selector=known.get(signature))
+
+    for contract, gas in deployments.items():
+        if sizes.get(contract) is not None:
+            gas["size"] = sizes[contract]
+
+    return joined, deployments
+
+###########
+# History #
+###########
+
+def open_history(path=HISTORY_FILE):
+    connection = sqlite3.connect(path, timeout=30)
+    connection.row_factory = sqlite3.Row
+
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0:
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.execute("PRAGMA user_version = %s" % SCHEMA_VERSION)
+        connection.commit()
+    elif version != SCHEMA_VERSION:
+        raise Exception("Unsupported gas history version %s in: %s" % (version, path))
+
+    return connection
+
+def current_commit():
+    try:
+        result = run(["git", "rev-parse", "--short", "HEAD"], stdout=PIPE, stderr=DEVNULL, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+# Stores the measurements as a new run, returning its ID.
+def record_run(connection, methods, deployments, label):
+    cursor = connection.execute(
+        "INSERT INTO runs (created, label, git_commit) VALUES (?, ?, ?)",
+        (int(time.time()), label, current_commit()),
+    )
+    run_id = cursor.lastrowid
+
+    connection.executemany(
+        "INSERT INTO methods (run, contract, signature, selector, calls, min, max, avg) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(run_id, contract, signature, gas["selector"], gas["calls"], gas["min"], gas["max"], gas["avg"])
+            for (contract, signature), gas in methods.items()],
+    )
+    connection.executemany(
+        "INSERT INTO deployments (run, contract, calls, min, max, avg, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(run_id, contract, gas["calls"] or 0, gas["min"], gas["max"], gas["avg"], gas["size"])
+            for contract, gas in deployments.items()],
+    )
+    connection.commit()
+    return run_id
+
+# Returns the run with the given ID, or the latest run with the given label. Without a reference, returns the latest
+# run. Runs that regressed are only recorded with --record-regressions, so this is the last accepted run.
+def find_run(connection, reference):
+    query = "SELECT * FROM runs"
+    params = []
+    if reference is not None:
+        query += " WHERE label = ? OR CAST(id AS TEXT) = ?"
+        params += [reference, reference]
+
+    return connection.execute(query + " ORDER BY id DESC LIMIT 1", params).fetchone()
+
+def load_run(connection, run_id):
+    methods = {}
+    for row in connection.execute("SELECT * FROM methods WHERE run = ?", (run_id,)):
+        methods[(row["contract"], row["signature"])] = dict(row)
+
+    deployments = {}
+    for row in connection.execute("SELECT * FROM deployments WHERE run = ?", (run_id,)):
+        deployments[row["contract"]] = dict(row)
+
+    return methods, deployments
+
+def describe_run(row):
+    details = [_ for _ in [row["label"], row["git_commit"]] if _ is not None]
+    created = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["created"]))
+    return "run %s (%s)" % (row["id"], ", ".join(details + [created]))
+
+###############
+# Comparisons #
+###############
+
+def change(old, new):
+    if old is None or new is None:
+        return 0.0
+    return (new - old) / max(old, 1) * 100
+
+# Prints the change of each method and deployment relative to the baseline. Returns the descriptions of those that
+# regressed past their threshold.
+def compare(methods, deployments, baseline_methods, baseline_deployments, threshold, size_threshold, verbose):
+    regressions = []
+    unchanged = 0
+
+    print("\nMethods:")
+    for (contract, signature), gas in sorted(methods.items()):
+        old = baseline_methods.get((contract, signature))
+        selector = gas.get("selector") or ""
+        if old is None:
+            print("  %-24s %-56s %-10s  avg %9s  (new)" % (contract, signature, selector, gas["avg"]))
+            continue
+
+        avg_change = change(old["avg"], gas["avg"])
+        max_change = change(old["max"], gas["max"])
+        regressed = avg_change > threshold or max_change > threshold
+        if regressed or verbose or avg_change != 0 or max_change != 0:
+            print("  %-24s %-56s %-10s  avg %9s -> %9s %+7.2f%%  max %9s -> %9s %+7.2f%%%s" % (
+                contract, signature, selector,
+                old["avg"], gas["avg"], avg_change,
+                old["max"], gas["max"], max_change,
+                "  REGRESSED" if regressed else "",
+            ))
+        else:
+            unchanged += 1
+        if regressed:
+            regressions.append("%s.%s" % (contract, signature))
+
+    print("\nDeployments:")
+    for contract, gas in sorted(deployments.items()):
+        old = baseline_deployments.get(contract)
+        limit = "  OVER EIP-170 LIMIT" if (gas["size"] or 0) > MAX_CONTRACT_SIZE else ""
+        if old is None:
+            print("  %-24s gas %9s  size %6s bytes  (new)%s" % (contract, gas["avg"], gas["size"], limit))
+            continue
+
+        gas_change = change(old["avg"], gas["avg"])
+        size_change = change(old["size"], gas["size"])
+        regressed = gas_change > threshold or size_change > size_threshold
+        if regressed or verbose or gas_change != 0 or size_change != 0 or limit != "":
+            print("  %-24s gas %9s -> %9s %+7.2f%%  size %6s -> %6s bytes %+7.2f%%%s%s" % (
+                contract,
+                old["avg"], gas["avg"], gas_change,
+                old["size"], gas["size"], size_change,
+                "  REGRESSED" if regressed else "", limit,
+            ))
+        else:
+            unchanged += 1
+        if regressed:
+            regressions.append("%s deployment" % contract)
+
+    if unchanged > 0:
+        print("\n%s unchanged (list them with --verbose)" % unchanged)
+    return regressions
+
+# Prints the average gas of the matching methods (as contract.signature globs) in every run.
+def print_history(connection, pattern):
+    runs = {}
+    for row in connection.execute("SELECT * FROM runs"):
+        runs[row["id"]] = row
+
+    history = {}
+    for row in connection.execute("SELECT * FROM methods ORDER BY run"):
+        key = "%s.%s" % (row["contract"], row["signature"])
+        if fnmatch.fnmatchcase(key, pattern) or fnmatch.fnmatchcase(row["contract"], pattern):
+            history.setdefault(key, []).append(row)
+
+    for key in sorted(history.keys()):
+        print(key)
+        previous = None
+        for row in history[key]:
+            print("  %-48s avg %9s  max %9s  %+7.2f%%" % (
+                describe_run(runs[row["run"]]), row["avg"], row["max"], change(previous, row["avg"]),
+            ))
+            previous = row["avg"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracks the gas used by the contracts, as measured by hardhat-gas-reporter during the tests.")
+    parser.add_argument("reports", nargs="*",
+        help="the JSON written by the gas reporter with outputJSON, or the test output with its table (- for stdin) (default: %s)" % DEFAULT_REPORT)
+    parser.add_argument("--label", help="label the recorded run, for example with the branch name")
+    parser.add_argument("--baseline", help="compare against this run ID, or the latest run with this label (default: the last recorded run)")
+    parser.add_argument("--threshold", type=float, default=1, help="the %% increase in gas that counts as a regression")
+    parser.add_argument("--size-threshold", type=float, help="the %% increase in deployed size that counts as a regression (default: --threshold)")
+    parser.add_argument("--no-record", action="store_true", help="only compare against the baseline, without recording the run")
+    parser.add_argument("--record-regressions", action="store_true",
+        help="record the run even if it regressed, accepting it as the new baseline (it still fails)")
+    parser.add_argument("--verbose", "-v", action="store_true", help="also list the methods and deployments that didn't change")
+    parser.add_argument("--history", metavar="GLOB", help="print the history of the methods matching contract.signature (or contract) and exit")
+    args = parser.parse_args()
+    if args.size_threshold is None:
+        args.size_threshold = args.threshold
+
+    connection = open_history()
+    try:
+        if args.history is not None:
+            print_history(connection, args.history)
+            return
+
+        methods = {}
+        deployments = {}
+        for report in args.reports or [DEFAULT_REPORT]:
+            if report != "-" and not os.path.exists(report):
+                print("No gas report at: %s" % report)
+                print("Pipe the test output in with `yarn --silent test | yarn --silent gas -`, or set gasReporter.outputJSON in hardhat.config.js to write the report to %s" % DEFAULT_REPORT)
+                sys.exit(1)
+
+            if report == "-":
+                measured = read_text_report(sys.stdin, echo=True)
+            elif report.endswith(".json"):
+                measured = read_json_report(report)
+            else:
+                with open(report) as f:
+                    measured = read_text_report(f)
+            methods.update(measured[0])
+            deployments.update(measured[1])
+
+        if len(methods) == 0 and len(deployments) == 0:
+            print("No gas measurements found")
+            sys.exit(1)
+        methods, deployments = join_artifacts(methods, deployments)
+
+        # Compare before recording, so that a regression doesn't become the baseline of the next run.
+        regressions = []
+        baseline = find_run(connection, args.baseline)
+        if baseline is None:
+            print("\nNo baseline to compare against")
+        else:
+            print("\nCompared to %s:" % describe_run(baseline))
+            regressions = compare(methods, deployments, *load_run(connection, baseline["id"]),
+                args.threshold, args.size_threshold, args.verbose)
+
+        if not args.no_record:
+            if len(regressions) == 0 or args.record_regressions:
+                run_id = record_run(connection, methods, deployments, args.label)
+                print("\nRecorded %s methods and %s deployments as run %s" % (len(methods), len(deployments), run_id))
+            else:
+                print("\nNot recording the run, as it regressed (accept it as the baseline with --record-regressions)")
+
+        if len(regressions) > 0:
+            print("\n%s regression(s) over the threshold:" % len(regressions))
+            for regression in regressions:
+                print("  %s" % regression)
+            sys.exit(1)
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,279 @@
+import argparse
+import fnmatch
+import io
 import json
 import os
 import re
-from sys import exc_info
-
-ARRAY_RE = re.compile("^.*\[\d*\]$")
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from functools import lru_cache
+from sys import exc_info, exit, stdin
+
+from abi_records import Event, Function, Parameter, ParsedContract, dump_contract, load_contract
+from contract_store import ContractStore, artifact_stats, hash_bytes, hash_json
+from json_select import select_file
+from keccak import keccak256
+from phase_stats import Stats
+from watcher import watch
+
+ABI_DIR = "tests/abi"
+ARTIFACTS_DIR = "artifacts"
+BUILD_INFO_DIR = "%s/build-info" % ARTIFACTS_DIR
+MANIFEST_FILE = "tools/.genabicache"
+MANIFEST_SEP = "\0\0"
+MANIFEST_HEADER = "generator"
+INDEX_DIR = "tools/.buildinfo"
+INDEX_FORMAT = "genabi-index-4"
+
+ARRAY_RE = re.compile("^(.*)\[(\d*)\]$")
 BYTES_RE = re.compile("^bytes(\d+)?$")
 NUMBER_RE = re.compile("^u?int(\d+)?$")
+TS_KEY_RE = re.compile(r'^( +)"([^"]+)":')
+TS_INDENT = "    "
+INHERITDOC_RE = re.compile(r"^\s*@inheritdoc\s+(\w+)\s*$")
+
+# The artifacts to generate if no others are included, matched against the artifact paths.
+DEFAULT_INCLUDE = ["*1155M*", "*Emulator*", "*Metatoken*", "*Mock*"]
+
+# Cache of build filenames to their details for additional parsing, least recently used first. A parsed build info can
+# take hundreds of megabytes, so the cache is bounded by the total size of the files it holds (in bytes).
+CACHED_BUILD_INFO = OrderedDict()
+CACHED_BUILD_INFO_SIZES = {}
+BUILD_INFO_CACHE_LIMIT = 256 * 1024 * 1024
+
+# The store of artifacts and their parsed ABIs, so unchanged artifacts don't need to be read at all.
+STORE = None
+# The workers only read the parsed contracts from the store, through their own connection, as the one they inherit
+# from the main process can't be used after forking.
+WORKER_STORE = None
+
+# Timings of each phase, if enabled with --stats.
+STATS = Stats()
+PHASES = ["walk", "parsed cache", "artifact load", "build info load", "documentation", "parse", "render", "write"]
+
+# Cache of build filenames to the compact index of their definitions (see getBuildIndex).
+CACHED_BUILD_INDEX = {}
+
+# Manifest of artifact paths to the hashes of the inputs and output of their last render.
+MANIFEST = {}
+MANIFEST_FIELDS = ["artifact", "build_file", "abi", "docs", "output", "output_hash"]
+
+def hashFile(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hash_bytes(f.read())
+
+# Any change to this script (or the modules it renders with) invalidates the manifest and the parsed contracts, as it
+# may change the rendered output.
+GENERATOR_HASH = hash_json([hashFile(os.path.join(os.path.dirname(__file__), _)) for _ in [
+    os.path.basename(__file__),
+    "abi_records.py",
+    "keccak.py",
+]])
+
+# If the typings also include the codecs of the functions and events (see renderCodecs), with --codecs.
+CODECS = False
+
+# The codecs change the rendered output, so they're rendered by a different generator.
+def enableCodecs():
+    global CODECS, GENERATOR_HASH
+    if not CODECS:
+        CODECS = True
+        GENERATOR_HASH = hash_json([GENERATOR_HASH, "codecs"])
+
+# If every contract's interfaces are rendered in full rather than extending those of the generated contracts that it
+# inherits from (see getInterfaceBases), with --flat-interfaces.
+FLAT_INTERFACES = False
+
+def enableFlatInterfaces():
+    global FLAT_INTERFACES, GENERATOR_HASH
+    if not FLAT_INTERFACES:
+        FLAT_INTERFACES = True
+        GENERATOR_HASH = hash_json([GENERATOR_HASH, "flat interfaces"])
+
+# The artifacts whose interfaces can be extended by the contracts that inherit from them, which are those generated
+# when nothing is targeted (so that the interfaces don't depend on what was last targeted).
+EXTENDABLE = set()
+
+# The include and exclude globs that decide which artifacts are extendable. The interfaces that are extended depend on
+# them, so the manifest is only reused with the same globs (see manifestHash).
+EXTENDABLE_GLOBS = None
+
+# Cache of artifact paths (and the build info of their compilation) to the rendered members of their interfaces.
+CACHED_INTERFACES = {}
+
+# If the typings are only checked against what would be generated, with --check. Nothing is written: the store is an
+# in-memory copy, and the build indexes are only kept in memory.
+CHECK = False
+
+# The number of worker processes that --check uses by default.
+CHECK_JOBS = 4
+
+# The outputs that --check found to be missing or different from what would be generated.
+STALE_OUTPUTS = []
+
+# Returns True if the file at the given path has exactly the given contents.
+def hasContents(path, data):
+    if not os.path.exists(path):
+        return False
+    with open(path, "rb") as f:
+        return f.read() == data
+
+# Writes the data to the given path, but only if it differs from what is already there.
+# Returns True if the file was written.
+def writeIfChanged(path, data):
+    if hasContents(path, data):
+        return False
+
+    with open(path, "wb") as f:
+        f.write(data)
+    return True
+
+# Returns the hash that the manifest is written with: that of the generator, and of the globs that decide which
+# interfaces are extended.
+def manifestHash():
+    if FLAT_INTERFACES or EXTENDABLE_GLOBS is None:
+        return GENERATOR_HASH
+    return hash_json([GENERATOR_HASH, EXTENDABLE_GLOBS])
+
+# Returns the entries of the given manifest, and if it was written by this version of the script (with the same
+# extendable contracts).
+def readManifestFile(path):
+    entries = {}
+    if not os.path.exists(path):
+        return entries, False
 
-# Cache of build filenames to their details for additional parsing.
-CACHED_BUILD_INFO = {}
+    with open(path) as f:
+        lines = f.read().split("\n")
 
-def firstUpper(string):
-    return string[0].upper() + string[1:]
+    for line in lines[1:]:
+        values = line.split(MANIFEST_SEP)
+        if len(values) != len(MANIFEST_FIELDS) + 1:
+            continue
+        entries[values[0]] = dict(zip(MANIFEST_FIELDS, values[1:]))
 
-def mapArrayType(type, isOutput):
-    parts = type.split("[")
-    baseType = mapType(parts[0], isOutput)
-    size = parts[1].split("]")[0]
+    return entries, lines[0] == "%s%s%s" % (MANIFEST_HEADER, MANIFEST_SEP, manifestHash())
 
-    if size == "":
-        if "|" in baseType:
-            baseType = "(%s)" % baseType
-        return "%s[]" % baseType
+def readManifest():
+    entries, current = readManifestFile(MANIFEST_FILE)
 
-    return "[%s]" % (", ".join([baseType] * int(size)))
+    # Discard the manifest if it was written by a different version of this script, or with different includes.
+    if current:
+        MANIFEST.update(entries)
 
-def mapType(type, isOutput):
-    if ARRAY_RE.match(type) is not None:
-        return mapArrayType(type, isOutput)
+def parsedKey(path, abi_hash):
+    return "%s:%s" % (contractKey(path)[1], abi_hash)
+
+def getParsed(path, abi_hash):
+    store = WORKER_STORE or STORE
+    if store is None:
+        return None
+
+    with STATS.phase("parsed cache", path):
+        record = store.parsed(parsedKey(path, abi_hash), GENERATOR_HASH)
+        return None if record is None else load_contract(record)
+
+# Forgets the parsed contracts that are no longer in the manifest.
+def pruneParsed():
+    STORE.prune_parsed(set([parsedKey(path, entry["abi"]) for path, entry in MANIFEST.items()]), GENERATOR_HASH)
+
+def writeManifest():
+    lines = ["%s%s%s" % (MANIFEST_HEADER, MANIFEST_SEP, manifestHash())]
+    for path in sorted(MANIFEST.keys()):
+        entry = MANIFEST[path]
+        lines.append(MANIFEST_SEP.join([path] + [entry[_] for _ in MANIFEST_FIELDS]))
+
+    with open(MANIFEST_FILE, "w") as f:
+        f.write("\n".join(lines))
+
+def firstUpper(string):
+    return string[0].upper() + string[1:]
+
+# Returns a hashable descriptor of a parameter's type (its type and those of its components, for tuples), so that
+# identical types are only resolved once.
+def typeDescriptor(parameter):
+    components = None
+    if "components" in parameter:
+        components = tuple([(_.get("name", ""), typeDescriptor(_)) for _ in parameter["components"]])
+    return parameter["type"], components
+
+# Resolves the TS type for a type descriptor, warning about any unknown types in it. The lookups are cached, so the
+# warnings are printed here rather than while looking it up, so that every use of an unknown type is reported.
+def resolveType(descriptor, isOutput):
+    resolved, unknown = lookupType(descriptor, isOutput)
+    warnUnknown(unknown)
+    return resolved
+
+# Resolves the TS type for the components of a tuple (or a function's outputs), like resolveType.
+def resolveStruct(components, isOutput):
+    resolved, unknown = lookupStruct(components, isOutput)
+    warnUnknown(unknown)
+    return resolved
+
+def warnUnknown(unknown):
+    for type in unknown:
+        print("WARN: unknown type: %s" % type)
+
+# Looks up the TS type for a type descriptor, and the unknown types in it. Shared interfaces repeat the same types across
+# many artifacts, so each distinct type is only looked up once per run.
+@lru_cache(maxsize=None)
+def lookupType(descriptor, isOutput):
+    type, components = descriptor
+
+    # Arrays are resolved from the outermost dimension in: T[2][] is a dynamic array of T[2].
+    match = ARRAY_RE.match(type)
+    if match is not None:
+        baseType, unknown = lookupType((match.group(1), components), isOutput)
+        size = match.group(2)
+        if size == "":
+            if "|" in baseType:
+                baseType = "(%s)" % baseType
+            return "%s[]" % baseType, unknown
+
+        return "[%s]" % (", ".join([baseType] * int(size))), unknown
+
+    if type == "tuple" and components is not None:
+        return lookupStruct(components, isOutput)
 
     if type == "address":
-        return "Address"
+        return "Address", ()
 
     if type == "bool":
-        return "boolean"
+        return "boolean", ()
 
     if type == "string":
-        return "string"
+        return "string", ()
 
     if NUMBER_RE.match(type) is not None:
         if isOutput:
-            return "BigNumber | typeof BN"
+            return "BigNumber | typeof BN", ()
         else:
-            return "CN<%s>" % firstUpper(type)
+            return "CN<%s>" % firstUpper(type), ()
 
     if BYTES_RE.match(type) is not None:
-        return firstUpper(type)
-    
-    print("WARN: unknown type: %s" % type)
+        return firstUpper(type), ()
 
-    return type
+    return type, (type,)
+
+# Looks up the TS type for the components of a tuple (or a function's outputs), and the unknown types in them. Inputs
+# are passed by name (or by index if unnamed), while outputs can be read by both.
+@lru_cache(maxsize=None)
+def lookupStruct(components, isOutput):
+    component_types = []
+    unknown = []
+    for i in range(len(components)):
+        name, descriptor = components[i]
+        component_type, component_unknown = lookupType(descriptor, isOutput)
+        unknown += [_ for _ in component_unknown if _ not in unknown]
+
+        if isOutput or name == "":
+            component_types.append("%s : %s" % (i, component_type))
+        if name != "":
+            component_types.append("%s : %s" % (name, component_type))
+
+    return "{ %s }" % "; ".join(component_types), tuple(unknown)
 
 def parseEvent(abi):
     try:
@@ -65,13 +289,13 @@ def parseEvent(abi):
     for input in inputs:
         try:
             name = input["name"]
-            type = input["type"]
+            type = typeDescriptor(input)
         except:
             return
 
-        properties.append([name, mapType(type, False)])
+        properties.append(Parameter(name, resolveType(type, False)))
 
-    return eventName, properties, anonymous
+    return Event(eventName, properties, anonymous)
 
 def parseFunction(abi):
     try:
@@ -89,7 +313,7 @@ def parseFunction(abi):
     for input in inputs:
         try:
             name = input["name"]
-            type = input["type"]
+            type = typeDescriptor(input)
         except:
             return
 
@@ -97,36 +321,21 @@ def parseFunction(abi):
             unnamedArgCount += 1
             name = "arg%s" % unnamedArgCount
 
-        parameters.append([name, mapType(type, False)])
+        parameters.append(Parameter(name, resolveType(type, False)))
 
-    # Parse the result
-    result = None
-    if len(outputs) > 1:
-        print("WARN: multiple outputs: %s" % name)
+    # Parse the result. Multiple outputs are returned like a tuple.
+    try:
+        outputs = tuple([(_.get("name", ""), typeDescriptor(_)) for _ in outputs])
+    except:
         return
-    if len(outputs) == 1:
-        output = outputs[0]
-        try:
-            type = output["type"]
-        except:
-            return
-
-        if type == "tuple":
-            component_types = []
-            components = output["components"]
-            for i in range(len(components)):
-                component = components[i]
-                component_type = mapType(component["type"], True)
-                component_types.append("%s : %s" % (i, component_type))
 
-                
-                if "name" in component and component["name"] != "":
-                    component_types.append("%s : %s" % (component["name"], component_type))
-            result = "{ %s }" % "; ".join(component_types)
-        else:
-            result = mapType(type, True)
+    result = None
+    if len(outputs) == 1:
+        result = resolveType(outputs[0][1], True)
+    elif len(outputs) > 1:
+        result = resolveStruct(outputs, True)
 
-    return functionName, parameters, result, mutability
+    return Function(functionName, parameters, result, mutability)
 
 def parseABI(abi):
     functions = []
@@ -156,11 +365,28 @@ def parseABI(abi):
 
     return functions, events
 
+# Parses the artifact into its render-ready contract.
+def parseContract(artifact):
+    name = artifact["contractName"]
+    functions, events = parseABI(artifact["abi"])
+
+    # Export the JSON, trimmed.
+    abi_export = ["export const %sABI = " % name]
+    renderLiteral(artifact["abi"], abi_export)
+    abi_export.append(";\n")
+    hashes, selectors = renderHashes(name, artifact["abi"])
+    constants = ["".join(abi_export)] + hashes
+    if CODECS:
+        constants += renderCodecs(name, artifact["abi"])
+    constants = "\n".join(constants)
+
+    return ParsedContract(name, artifact.get("sourceName", ""), functions, events, constants, selectors)
+
 def renderParameters(parameters, mutability):
     rendered = []
 
     for parameter in parameters:
-        rendered.append("%s : %s" % (parameter[0], parameter[1]))
+        rendered.append("%s : %s" % (parameter.name, parameter.type))
 
     if mutability == "payable":
         rendered.append("optionsPayable? : OptionsPayable")
@@ -169,11 +395,12 @@ def renderParameters(parameters, mutability):
 
     return ", ".join(rendered)
 
-def renderResult(contractName, name, result, mutability):
+def renderResult(contractName, name, result, mutability, warn=True):
     if mutability == "payable" or mutability == "nonpayable":
         if result is None:
-            return "CallResult<%sEvents>" % contractName
-        if "mock" not in name and "proxy" not in name:
+            # The methods take the events of the contract they're called on, so that they can be inherited.
+            return "CallResult<%sEvents>" % contractName if FLAT_INTERFACES else "CallResult<E>"
+        if warn and "mock" not in name and "proxy" not in name:
             print("WARN: non-void result for non-view/non-pure: %s" % name)
 
     if result is None:
@@ -182,11 +409,7 @@ def renderResult(contractName, name, result, mutability):
     return result
 
 def renderEventProperties(properties):
-    for i in range(len(properties)):
-        name, type = properties[i]
-        properties[i] = "%s : %s" % (name, type)
-
-    return "; ".join(properties)
+    return "; ".join(["%s : %s" % (_.name, _.type) for _ in properties])
 
 def renderDocumentation(docs):
     docs = docs.replace("\r", "").replace("@dev", "")
@@ -197,48 +420,403 @@ def renderDocumentation(docs):
         lines = "\n     * ".join(lines)
         return "    /**\n     * %s\n     */\n" % lines
 
-def renderEvent(details, documentation):
-    name, properties, anonymous = details
-
+def renderEvent(event, documentation):
     docs = ""
-    if name in documentation:
-        docs = renderDocumentation(documentation[name])
+    if event.name in documentation:
+        docs = renderDocumentation(documentation[event.name])
 
-    return "%s    %s : { %s };" % (docs, name, renderEventProperties(properties))
+    return "%s    %s : { %s };" % (docs, event.name, renderEventProperties(event.properties))
 
-def renderFunction(contractName, details, documentation):
-    name, parameters, result, mutability = details
+def renderFunction(contractName, function, documentation, warn=True):
+    name = function.name
+    mutability = function.mutability
 
     docs = ""
     if name in documentation:
         docs = renderDocumentation(documentation[name])
 
-    return "%s    %s : (%s) => Promise<%s>;" % (docs, name, renderParameters(parameters, mutability), renderResult(contractName, name, result, mutability))
+    return "%s    %s : (%s) => Promise<%s>;" % (docs, name, renderParameters(function.parameters, mutability), renderResult(contractName, name, function.result, mutability, warn))
 
-def renderABI(artifact, functions, events, documentation, ownDefinitions):
-    name = artifact["contractName"]
+# Renders a JSON value as a TS literal into the output buffer. This is laid out like json.dumps(indent=4), but with
+# unquoted keys (where possible) and trailing commas after strings and objects.
+def renderLiteral(value, output, indent=""):
+    if isinstance(value, dict):
+        if len(value) == 0:
+            output.append("{}")
+
+            # A bare top-level empty object still gets the trailing comma.
+            if indent == "":
+                output.append(",")
+            return
+
+        output.append("{")
+        item_indent = indent + TS_INDENT
+        last = len(value) - 1
+        for i, (key, item) in enumerate(value.items()):
+            output.append("\n")
+            key = json.dumps(key)
+            if '"' in key[1:-1] or len(key) == 2:
+                # Let the pattern decide how much of an unusual key can be unquoted.
+                output.append(TS_KEY_RE.sub(r"\1\2 :", "%s%s:" % (item_indent, key)))
+            else:
+                output.append("%s%s :" % (item_indent, key[1:-1]))
+            output.append(" ")
+            renderLiteral(item, output, item_indent)
+            if i < last or isinstance(item, (str, dict)):
+                output.append(",")
+        output.append("\n%s}" % indent)
+
+    elif isinstance(value, list):
+        if len(value) == 0:
+            output.append("[]")
+            return
+
+        output.append("[")
+        item_indent = indent + TS_INDENT
+        last = len(value) - 1
+        for i, item in enumerate(value):
+            output.append("\n")
+            if isinstance(item, str):
+                line = item_indent + json.dumps(item)
+                if '":' in line:
+                    line = TS_KEY_RE.sub(r"\1\2 :", line)
+                output.append(line)
+            else:
+                output.append(item_indent)
+                renderLiteral(item, output, item_indent)
+            if i < last or isinstance(item, (str, dict)):
+                output.append(",")
+        output.append("\n%s]" % indent)
+
+    else:
+        output.append(json.dumps(value))
+
+        # A bare top-level string still gets the trailing comma.
+        if indent == "" and isinstance(value, str):
+            output.append(",")
+
+# Returns the canonical type of a parameter as used in signatures, with tuples expanded into their components.
+def canonicalType(parameter):
+    type = parameter["type"]
+    if type[:5] == "tuple":
+        return "(%s)%s" % (",".join([canonicalType(_) for _ in parameter["components"]]), type[5:])
+    return type
+
+# Returns the canonical signature of a function or event, or None if it is missing any of the required fields.
+def canonicalSignature(abi):
+    try:
+        return "%s(%s)" % (abi["name"], ",".join([canonicalType(_) for _ in abi["inputs"]]))
+    except KeyError:
+        return None
+
+# The same signatures turn up in many contracts through inheritance, so each is only hashed once.
+@lru_cache(maxsize=None)
+def hashSignature(signature):
+    return keccak256(bytes(signature, "UTF-8"))
+
+# Renders the function selectors and the event topics, so the tests don't need to hash the signatures at runtime.
+# Also returns the selectors of the functions, as hex.
+def renderHashes(name, abi):
+    selectors = []
+    topics = []
+    function_selectors = []
+    for item in abi:
+        if item.get("type") not in ("function", "event"):
+            continue
+
+        signature = canonicalSignature(item)
+        if signature is None:
+            continue
+
+        if item["type"] == "function":
+            selector = hashSignature(signature)[:4]
+            function_selectors.append(selector.hex())
+            selectors.append('    "%s" : "0x%s",' % (signature, selector.hex()))
+        elif not item.get("anonymous", False):
+            topics.append('    "%s" : "0x%s",' % (signature, hashSignature(signature).hex()))
+
+    output = []
+    for label, constant, entries in [
+        ("The selectors of the functions, by signature.", "Selectors", selectors),
+        ("The topics of the (non-anonymous) events, by signature.", "Topics", topics),
+    ]:
+        output.append("/** %s */" % label)
+        if len(entries) > 0:
+            output.append("export const %s%s = {" % (name, constant))
+            output.extend(entries)
+            output.append("} as const;\n")
+        else:
+            output.append("export const %s%s = {} as const;\n" % (name, constant))
+
+    return output, function_selectors
+
+# Renders the ERC-165 interface ID of the contract: that of the functions it declares itself, like type(I).interfaceId.
+# Without the contract's definitions (see getDocumentation), every function in its ABI is used instead.
+def renderInterfaceId(parsed, ownDefinitions):
+    selectors = parsed.selectors
+    if "FunctionSelector" in ownDefinitions:
+        selectors = ownDefinitions["FunctionSelector"].keys()
+
+    interface_id = 0
+    for selector in selectors:
+        interface_id ^= int(selector, 16)
+
+    return [
+        "/** The ERC-165 interface ID of the functions that the contract declares itself, not those it inherits. */",
+        'export const %sInterfaceId = "0x%08x";\n' % (parsed.contract, interface_id),
+    ]
+
+# Resolves the codec (see tests/abiCodec.ts) for a type descriptor, returning the TS expression that builds it, if it
+# is dynamic and the size of its head. Returns None for types that can't be encoded.
+@lru_cache(maxsize=None)
+def resolveCodec(descriptor):
+    type, components = descriptor
+
+    match = ARRAY_RE.match(type)
+    if match is not None:
+        item = resolveCodec((match.group(1), components))
+        if item is None:
+            return None
+
+        expression, dynamic, headSize = item
+        if match.group(2) == "":
+            return "codec.array(%s)" % expression, True, 32
+
+        length = int(match.group(2))
+        return "codec.array(%s, %s)" % (expression, length), dynamic, 32 if dynamic else headSize * length
+
+    if type == "tuple" and components is not None:
+        items = [resolveCodec(_[1]) for _ in components]
+        if None in items:
+            return None
+
+        dynamic = True in [_[1] for _ in items]
+        expression = "codec.tuple([%s], [%s])" % (
+            ", ".join([_[0] for _ in items]),
+            ", ".join([json.dumps(_[0]) for _ in components]),
+        )
+        return expression, dynamic, 32 if dynamic else sum([_[2] for _ in items])
+
+    if type in ("address", "bool", "bytes", "string"):
+        return "codec.%s" % type, type in ("bytes", "string"), 32
+
+    match = NUMBER_RE.match(type)
+    if match is not None:
+        return "codec.%s(%s)" % (type.rstrip("0123456789"), match.group(1) or 256), False, 32
+
+    match = BYTES_RE.match(type)
+    if match is not None:
+        return "codec.fixedBytes(%s)" % match.group(1), False, 32
+
+    return None
+
+# Renders the statements reading a sequence of values (given as the indices, dynamic flags and head sizes of their
+# codecs) from the hex data `d` into v0, v1, etc. The offsets of the static values, and of the offsets of the dynamic
+# values, are baked in.
+def renderDecodes(codecs, indent):
+    reads = []
+    offset = 0
+    for i, (index, dynamic, headSize) in enumerate(codecs):
+        position = "codec.readNumber(d, %s)" % offset if dynamic else str(offset)
+        reads.append("%sconst v%s = CODECS[%s].decode(d, %s);" % (indent, i, index, position))
+        offset += headSize
+    return reads
+
+# Renders the decoded values as an object, by both index and name (if named), like the results of calls.
+def renderDecoded(names, variables):
+    properties = []
+    for i, name in enumerate(names):
+        properties.append("%s : %s" % (i, variables[i]))
+        if name != "":
+            properties.append("%s : %s" % (name, variables[i]))
+    return "{ %s }" % ", ".join(properties)
+
+# Renders specialized encoders and decoders for the functions and events, so the tests don't need a generic ABI coder
+# to interpret the ABI on every call. The selectors, topics and head offsets are baked in, and the codec of each type is
+# only built once. Functions and events with types that can't be encoded are skipped.
+def renderCodecs(name, abi):
+    codecs = []
+    indices = {}
+
+    # Returns the index, if it is dynamic and the head size of each parameter's codec, or None if any can't be encoded.
+    def codecsOf(parameters):
+        resolved = []
+        for parameter in parameters:
+            codec = resolveCodec(typeDescriptor(parameter))
+            if codec is None:
+                return None
+            if codec[0] not in indices:
+                indices[codec[0]] = len(codecs)
+                codecs.append(codec[0])
+            resolved.append((indices[codec[0]], codec[1], codec[2]))
+        return resolved
+
+    overloads = {}
+    for item in abi:
+        if item.get("type") in ("function", "event"):
+            key = (item["type"], item.get("name"))
+            overloads[key] = overloads.get(key, 0) + 1
+
+    functions = []
+    events = []
+    for item in abi:
+        signature = canonicalSignature(item) if item.get("type") in ("function", "event") else None
+        if signature is None:
+            continue
+        key = item["name"] if overloads[(item["type"], item["name"])] == 1 else json.dumps(signature)
+
+        if item["type"] == "function":
+            function = parseFunction(item)
+            inputs = codecsOf(item["inputs"])
+            outputs = codecsOf(item.get("outputs", []))
+            if function is None or inputs is None or outputs is None:
+                continue
+
+            selector = "0x%s" % hashSignature(signature)[:4].hex()
+            parameters = ", ".join(["%s : %s" % (_.name, _.type) for _ in function.parameters])
+            arguments = [_.name for _ in function.parameters]
+            if True in [_[1] for _ in inputs]:
+                encoded = ' + codec.encodeSequence([%s], [%s], %s)' % (
+                    ", ".join(["CODECS[%s]" % _[0] for _ in inputs]),
+                    ", ".join(arguments),
+                    sum([_[2] for _ in inputs]),
+                )
+            else:
+                encoded = "".join([" + CODECS[%s].encode(%s)" % (codec[0], argument) for codec, argument in zip(inputs, arguments)])
+
+            functions.append("    %s : {" % key)
+            functions.append('        selector : "%s",' % selector)
+            functions.append('        encode : (%s) : string => "%s"%s,' % (parameters, selector, encoded))
+            if len(outputs) > 0:
+                variables = ["v%s" % _ for _ in range(len(outputs))]
+                functions.append("        decode : (data : string) : %s => {" % function.result)
+                functions.append("            const d = codec.strip(data);")
+                functions.extend(renderDecodes(outputs, "            "))
+                if len(outputs) == 1:
+                    functions.append("            return v0;")
+                else:
+                    functions.append("            return %s;" % renderDecoded([_.get("name", "") for _ in item["outputs"]], variables))
+                functions.append("        },")
+            functions.append("    },")
+
+        else:
+            # Indexed values are in the topics after the event's own, although only the hash of a reference type is, so
+            # those are left as the raw topic.
+            indexed = [_ for _ in item["inputs"] if _.get("indexed", False)]
+            values = [_ for _ in indexed if _["type"] not in ("bytes", "string") and _["type"][:5] != "tuple" and ARRAY_RE.match(_["type"]) is None]
+            indexed_codecs = codecsOf(values)
+            data_codecs = codecsOf([_ for _ in item["inputs"] if not _.get("indexed", False)])
+            if indexed_codecs is None or data_codecs is None:
+                continue
+
+            anonymous = item.get("anonymous", False)
+            reads = []
+            value_codecs = iter(indexed_codecs)
+            for i, parameter in enumerate(indexed):
+                topic = "log.topics[%s]" % (i if anonymous else i + 1)
+                if parameter in values:
+                    reads.append("            const t%s = CODECS[%s].decode(codec.strip(%s), 0);" % (i, next(value_codecs)[0], topic))
+                else:
+                    reads.append("            const t%s = %s;" % (i, topic))
+
+            variables = []
+            for parameter in item["inputs"]:
+                if parameter.get("indexed", False):
+                    variables.append("t%s" % len([_ for _ in variables if _[0] == "t"]))
+                else:
+                    variables.append("v%s" % len([_ for _ in variables if _[0] == "v"]))
+
+            events.append("    %s : {" % key)
+            if not anonymous:
+                events.append('        topic : "0x%s",' % hashSignature(signature).hex())
+            events.append("        decode : (log : codec.Log) => {")
+            if len(data_codecs) > 0:
+                events.append("            const d = codec.strip(log.data);")
+            events.extend(reads + renderDecodes(data_codecs, "            "))
+            events.append("            return %s;" % renderDecoded([_.get("name", "") for _ in item["inputs"]], variables))
+            events.append("        },")
+            events.append("    },")
+
+    output = []
+    if len(functions) + len(events) > 0:
+        output.append("// The codec of each type used by %sCodecs and %sEventCodecs." % (name, name))
+        output.append("const CODECS : codec.Codec<any, any>[] = [")
+        output.extend(["    %s," % _ for _ in codecs])
+        output.append("];\n")
+
+    for label, constant, entries in [
+        ("Encodes the calldata of the functions and decodes their results, by name (or signature, if overloaded).", "Codecs", functions),
+        ("Decodes the logs of the events, by name (or signature, if overloaded).", "EventCodecs", events),
+    ]:
+        output.append("/** %s */" % label)
+        if len(entries) > 0:
+            output.append("export const %s%s = {" % (name, constant))
+            output.extend(entries)
+            output.append("};\n")
+        else:
+            output.append("export const %s%s = {};\n" % (name, constant))
+
+    return output
+
+# Renders the members of a contract's interfaces: its events and functions (including the constructor) by name, and if
+# its methods take the events type of the contract they're called on. The warnings are only printed when rendering the
+# contract's own typings, not when it's rendered as the base of another.
+def renderMembers(parsed, documentation, warn=True):
+    events = {}
+    for event in parsed.events:
+        events[event.name] = renderEvent(event, documentation["EventDefinition"])
+
+    functions = {}
+    for function in parsed.functions:
+        functions[function.name] = renderFunction(parsed.contract, function, documentation["FunctionDefinition"], warn)
+
+    return {
+        "contract" : parsed.contract,
+        "events" : events,
+        "functions" : functions,
+        "generic" : True in ["CallResult<E>" in _ for _ in functions.values()],
+    }
+
+# Renders the typings of a contract from its rendered members. The members of the given base interfaces (see
+# getInterfaceBases) are extended rather than repeated.
+def renderABI(parsed, members, ownDefinitions, bases):
+    name = parsed.contract
+    inherited_events = set([_ for base in bases for _ in base["events"]])
+    inherited_functions = set([_ for base in bases for _ in base["functions"]])
+    events = [_ for _ in parsed.events if _.name not in inherited_events]
+    functions = [_ for _ in parsed.functions if _.name not in inherited_functions]
+
+    methods = "%sMethods" % name
+    if not FLAT_INTERFACES and (members["generic"] or True in [_["generic"] for _ in bases]):
+        methods = "%sMethods<E = %sEvents>" % (name, name)
+    events_extends = ""
+    methods_extends = ""
+    if len(bases) > 0:
+        events_extends = " extends %s" % ", ".join(["%sEvents" % _["contract"] for _ in bases])
+        extended = []
+        for base in bases:
+            base_methods = "%sMethods%s" % (base["contract"], "<E>" if base["generic"] else "")
+            extended.append('Omit<%s, "__constructor__">' % base_methods if base["constructor"] else base_methods)
+        methods_extends = " extends %s" % ", ".join(extended)
 
     output = [
         "/* eslint-disable max-len */",
         "/* eslint-disable @typescript-eslint/no-use-before-define */\n",
-        'import type { BN } from "bn.js";',
-        'import { CallResult } from "tests/transactions";',
-        "",
         "export type %sArtifact = Artifact<typeof %sABI, %sMethods, %sEvents>;" % (name, name, name, name),
         "export type %sContract = DeployedContract<typeof %sABI, %sMethods, %sEvents>;\n" % (name, name, name, name),
     ]
 
     if len(events) > 0:
-        output.append("export interface %sEvents {" % name)
+        output.append("export interface %sEvents%s {" % (name, events_extends))
         for event in events:
-            output.append(renderEvent(event, documentation["EventDefinition"]))
+            output.append(members["events"][event.name])
         output.append("}\n")
     else:
         output.append("// eslint-disable-next-line @typescript-eslint/no-empty-interface")
-        output.append("export interface %sEvents {}\n" % name)
+        output.append("export interface %sEvents%s {}\n" % (name, events_extends))
 
     needs_call_result_import = False
-    needs_bn_import = False
+    needs_bn_import = "typeof BN" in parsed.constants
     if len(functions) > 0:
         # We'll be sorting the functions first by mutability then by name, grouped by own / inherited.
         function_groups = {
@@ -249,8 +827,8 @@ def renderABI(artifact, functions, events, documentation, ownDefinitions):
 
         # Render all the functions
         for function in functions:
-            function_name = function[0]
-            mutability = function[3]
+            function_name = function.name
+            mutability = function.mutability
 
             if function_name == "__constructor__":
                 group = function_groups["Constructors"] 
@@ -261,14 +839,14 @@ def renderABI(artifact, functions, events, documentation, ownDefinitions):
 
             if mutability not in group:
                 group[mutability] = {}
-            group[mutability][function_name] = renderFunction(name, function, documentation["FunctionDefinition"])
+            group[mutability][function_name] = members["functions"][function_name]
             if not needs_call_result_import and "CallResult<" in group[mutability][function_name]:
                 needs_call_result_import = True
             if not needs_bn_import and "typeof BN" in group[mutability][function_name]:
                 needs_bn_import = True
 
         # Combine the mutabilities.
-        output.append("export interface %sMethods {" % name)
+        output.append("export interface %s%s {" % (methods, methods_extends))
         first = True
         for group in ["Constructors", "Own Functions", "Inherited Functions"]:
             # Skip empty groups
@@ -296,34 +874,29 @@ def renderABI(artifact, functions, events, documentation, ownDefinitions):
         output.append("}\n")
     else:
         output.append("// eslint-disable-next-line @typescript-eslint/no-empty-interface")
-        output.append("export interface %sMethods {}\n" % name)
-
-    # We don't need to import CallResult
-    removed = 0
-    if not needs_bn_import:
-        output.remove(output[2])
-        removed += 1
-    if not needs_call_result_import:
-        output.remove(output[3 - removed])
-        removed += 1
-    if removed == 2:
-        output.remove(output[4 - removed])
-
-    # Export the JSON, trimmed.
-    json_export = json.dumps(artifact["abi"], indent=4)
-    json_lines = json_export.split("\n")
-    for i in range(len(json_lines)):
-        json_lines[i] = re.sub(r'^( +)"([^"]+)":', r'\1\2 :', json_lines[i])
-        json_lines[i] = re.sub(r'^(.+["\}])$', r'\1,', json_lines[i])
-    json_export = "\n".join(json_lines)
-    output.append("export const %sABI = %s;\n" % (name, json_export))
-
-    with open("tests/abi/%s.ts" % name, "wb") as f:
-        f.write(bytes("\n".join(output), "UTF-8"))
-
-# Attempts to get the build info for a given compilation, caching for subsequent calls.
+        output.append("export interface %s%s {}\n" % (methods, methods_extends))
+
+    # Only import what we need, with a blank line after the imports if there are any.
+    imports = []
+    if needs_bn_import:
+        imports.append('import type { BN } from "bn.js";')
+    for base in bases:
+        imports.append('import type { %sEvents, %sMethods } from "%s/%s";' % (base["contract"], base["contract"], ABI_DIR, base["contract"]))
+    if "const CODECS" in parsed.constants:
+        imports.append('import * as codec from "tests/abiCodec";')
+    if needs_call_result_import:
+        imports.append('import { CallResult } from "tests/transactions";')
+    if len(imports) > 0:
+        output[2:2] = imports + [""]
+
+    output.append(parsed.constants)
+    output += renderInterfaceId(parsed, ownDefinitions)
+
+    return "%s/%s.ts" % (ABI_DIR, name), bytes("\n".join(output), "UTF-8")
+
+# Attempts to get the name of the build info file for a given compilation.
 # Returns None if there was an error.
-def getBuildInfo(path):
+def getBuildFile(path):
     debug_path = path[:-5] + ".dbg.json"
     if not os.path.exists(debug_path):
         print("WARN: No debug file for: %s" % path)
@@ -341,28 +914,220 @@ def getBuildInfo(path):
         print("WARN: Could not extract build info from: %s" % debug_path)
         return None
 
-    # Get the actual build file, caching it if we haven't seen it before.
-    build_file = debug_details["buildInfo"].replace("\\", "/").split("/")[-1]
-    if build_file not in CACHED_BUILD_INFO:
-        if not os.path.exists("artifacts/build-info/%s" % build_file):
-            raise Exception("Missing build file for %s: %s" % (path, build_file))
+    return debug_details["buildInfo"].replace("\\", "/").split("/")[-1]
 
-        with open("artifacts/build-info/%s" % build_file) as f:
-            CACHED_BUILD_INFO[build_file] = json.load(f)
+# Attempts to get the build info for a given compilation, caching for subsequent calls.
+# Returns None if there was an error.
+def getBuildInfo(path):
+    build_file = getBuildFile(path)
+    if build_file is None:
+        return None
+
+    if build_file in CACHED_BUILD_INFO:
+        CACHED_BUILD_INFO.move_to_end(build_file)
+        return CACHED_BUILD_INFO[build_file]
+
+    # Get the actual build file, evicting the least recently used ones to make room for it.
+    if not os.path.exists("%s/%s" % (BUILD_INFO_DIR, build_file)):
+        raise Exception("Missing build file for %s: %s" % (path, build_file))
+
+    size = os.path.getsize("%s/%s" % (BUILD_INFO_DIR, build_file))
+    while len(CACHED_BUILD_INFO) > 0 and sum(CACHED_BUILD_INFO_SIZES.values()) + size > BUILD_INFO_CACHE_LIMIT:
+        releaseBuildInfo(next(iter(CACHED_BUILD_INFO)))
+
+    with open("%s/%s" % (BUILD_INFO_DIR, build_file)) as f:
+        CACHED_BUILD_INFO[build_file] = json.load(f)
+    CACHED_BUILD_INFO_SIZES[build_file] = size
 
     return CACHED_BUILD_INFO[build_file]
 
-# Returns the documentation associated with a given artifact.
+# Drops the given build info from the cache, once all of the artifacts from its compilation have been generated.
+def releaseBuildInfo(build_file):
+    CACHED_BUILD_INFO.pop(build_file, None)
+    CACHED_BUILD_INFO_SIZES.pop(build_file, None)
+
+# The parts of the build info that buildIndex reads, so that the rest of it can be skipped.
+BUILD_INFO_SELECTION = {"output": {"sources": {"*": {"ast": {"nodes": [{
+    "nodeType": True,
+    "name": True,
+    "id": True,
+    "linearizedBaseContracts": True,
+    "nodes": [{
+        "nodeType": True,
+        "visibility": True,
+        "name": True,
+        "documentation": {"text": True},
+        "functionSelector": True,
+    }],
+}]}}}}}
+
+# Extracts every contract in the build info, with the contracts it inherits from (by their AST ids, most derived first)
+# and the definitions that getDocumentation needs, so that we don't have to load the full build info (which includes
+# the solc input and output for every dependency) on subsequent runs.
+def buildIndex(build_info):
+    contracts = {}
+    for source_name, source in build_info["output"]["sources"].items():
+        contracts[source_name] = []
+        for block in source["ast"]["nodes"]:
+            if block.get("nodeType") != "ContractDefinition" or "nodes" not in block:
+                continue
+
+            definitions = []
+            for node in block["nodes"]:
+                values = []
+                for key in ["nodeType", "visibility", "name"]:
+                    if key in node:
+                        values.append(node[key])
+                    else:
+                        values.append(None)
+
+                if None in values or values[0] not in ("EventDefinition", "FunctionDefinition"):
+                    continue
+
+                if "documentation" in node:
+                    values.append(node["documentation"]["text"])
+                else:
+                    values.append(None)
+                values.append(node.get("functionSelector"))
+                definitions.append(values)
+
+            contracts[source_name].append([block["name"], block["id"], block["linearizedBaseContracts"], definitions])
+
+    return {
+        "format" : INDEX_FORMAT,
+        "contracts" : contracts,
+    }
+
+# Builds the inheritance graph of a compilation from its index: every contract by its AST id, with its source name and
+# contract name, the ids of the contracts it inherits from (most derived first, including itself) and its definitions.
+def buildInheritance(index):
+    contracts = {}
+    ids = {}
+    for source_name, definitions in index["contracts"].items():
+        for name, id, bases, nodes in definitions:
+            contracts[id] = {
+                "key" : (source_name, name),
+                "bases" : bases,
+                "definitions" : nodes,
+            }
+            ids[(source_name, name)] = id
+
+    return {
+        "contracts" : contracts,
+        "ids" : ids,
+    }
+
+# Attempts to get the definition index for a given compilation, building it from the build info if we haven't seen
+# this compilation before. Returns None if there was an error.
+def getBuildIndex(path):
+    build_file = getBuildFile(path)
+    if build_file is None:
+        return None
+
+    if build_file in CACHED_BUILD_INDEX:
+        return CACHED_BUILD_INDEX[build_file]
+
+    # Build info files are named by the hash of their compilation, so an existing index is never stale.
+    index_path = "%s/%s" % (INDEX_DIR, build_file)
+    index = None
+    with STATS.phase("build info load", path):
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                try:
+                    index = json.load(f)
+                except Exception:
+                    index = None
+            if index is not None and index.get("format") != INDEX_FORMAT:
+                index = None
+
+        if index is None:
+            try:
+                index = buildIndex(select_file("%s/%s" % (BUILD_INFO_DIR, build_file), BUILD_INFO_SELECTION))
+            except (OSError, ValueError):
+                # Fall back to loading it whole, which reports what is wrong with it.
+                index = buildIndex(getBuildInfo(path))
+            if not CHECK:
+                os.makedirs(INDEX_DIR, exist_ok=True)
+                with open(index_path, "w") as f:
+                    json.dump(index, f, separators=(",", ":"))
+
+    return cacheBuildIndex(build_file, index)
+
+# Caches the index of a compilation, with its inheritance graph. The graph is only kept in memory, as it is quick to
+# build from the index.
+def cacheBuildIndex(build_file, index):
+    index["inheritance"] = buildInheritance(index)
+    CACHED_BUILD_INDEX[build_file] = index
+    return index
+
+# Returns the index of a compilation as it is stored, without its inheritance graph, e.g. to send it to a worker.
+def storedBuildIndex(build_file):
+    index = CACHED_BUILD_INDEX.get(build_file)
+    if index is None:
+        return None
+    return dict([_ for _ in index.items() if _[0] != "inheritance"])
+
+# Releases the cached details of any compilations that no longer exist.
+def forgetRemovedBuilds():
+    for build_file in list(CACHED_BUILD_INFO.keys()):
+        if not os.path.exists("%s/%s" % (BUILD_INFO_DIR, build_file)):
+            releaseBuildInfo(build_file)
+    for build_file in list(CACHED_BUILD_INDEX.keys()):
+        if not os.path.exists("%s/%s" % (BUILD_INFO_DIR, build_file)):
+            del CACHED_BUILD_INDEX[build_file]
+    for key in list(CACHED_INTERFACES.keys()):
+        if not os.path.exists("%s/%s" % (BUILD_INFO_DIR, key[1])):
+            del CACHED_INTERFACES[key]
+
+# Removes the indexes of any compilations that no longer exist.
+def pruneBuildIndexes():
+    forgetRemovedBuilds()
+    if not os.path.exists(INDEX_DIR):
+        return
+
+    for build_file in os.listdir(INDEX_DIR):
+        if not os.path.exists("%s/%s" % (BUILD_INFO_DIR, build_file)):
+            os.unlink("%s/%s" % (INDEX_DIR, build_file))
+
+# Returns the public and external definitions of a contract, as (nodeType, name, docs).
+def publicDefinitions(contract):
+    for nodeType, visibility, name, docs, selector in contract["definitions"]:
+        if visibility in ("public", "external"):
+            yield nodeType, name, docs
+
+# Returns the documentation of the given definition, replacing a bare @inheritdoc with the documentation of the same
+# definition in the named base contract.
+def resolveDocumentation(inheritance, bases, nodeType, name, docs, depth=0):
+    match = INHERITDOC_RE.match(docs)
+    if match is None or depth > len(bases):
+        return docs
+
+    for id in bases:
+        base = inheritance["contracts"].get(id)
+        if base is None or base["key"][1] != match.group(1):
+            continue
+
+        for baseNodeType, baseName, baseDocs in publicDefinitions(base):
+            if baseNodeType == nodeType and baseName == name and baseDocs is not None:
+                return resolveDocumentation(inheritance, base["bases"], nodeType, name, baseDocs, depth + 1)
+
+    return docs
+
+# Returns the documentation associated with a given artifact, and its own definitions. The documentation of each
+# definition comes from the most derived contract that documents it, so base contracts' docs reach the contracts that
+# implement them.
 def getDocumentation(path):
-    artifact_name = "/".join(path.replace("\\", "/").split("/")[1:-1])
-    
-    # Get the build info for this artifact.
-    build_info = getBuildInfo(path)
+    # Get the definitions for this artifact.
+    index = getBuildIndex(path)
+    if index is None:
+        raise Exception("No build info for: %s" % path)
 
-    # Get the AST for this artifact
-    ast = build_info["output"]["sources"][artifact_name]["ast"]["nodes"]
+    inheritance = index["inheritance"]
+    id = inheritance["ids"].get(contractKey(path))
+    if id is None:
+        raise Exception("No contract definition for: %s" % path)
+    bases = inheritance["contracts"][id]["bases"]
 
-    # Extract the function documentation from this artifact.
     documentation = {
         "EventDefinition" : {},
         "FunctionDefinition" : {},
@@ -370,60 +1135,297 @@ def getDocumentation(path):
     ownDefinitions = {
         "EventDefinition" : {},
         "FunctionDefinition" : {},
+        "FunctionSelector" : {},
     }
-    for block in ast:
-        if "nodes" not in block:
+    with STATS.phase("documentation", path):
+        for nodeType, name, docs in publicDefinitions(inheritance["contracts"][id]):
+            ownDefinitions[nodeType][name] = True
+        for nodeType, visibility, name, docs, selector in inheritance["contracts"][id]["definitions"]:
+            if selector is not None:
+                ownDefinitions["FunctionSelector"][selector] = True
+            elif nodeType == "FunctionDefinition" and visibility in ("public", "external") and name != "":
+                # Compilers before 0.6 don't record the selectors.
+                del ownDefinitions["FunctionSelector"]
+                break
+
+        for base_id in bases:
+            if base_id not in inheritance["contracts"]:
+                continue
+
+            for nodeType, name, docs in publicDefinitions(inheritance["contracts"][base_id]):
+                # Make sure it has documentation, and isn't documented by a more derived contract.
+                if docs is None or name in documentation[nodeType]:
+                    continue
+                documentation[nodeType][name] = resolveDocumentation(inheritance, bases, nodeType, name, docs)
+
+    return documentation, ownDefinitions
+
+# Returns the rendered members of a generated contract's interfaces (see renderMembers), for the contracts that inherit
+# from it.
+def getInterface(path):
+    key = (path, getBuildFile(path))
+    if key not in CACHED_INTERFACES:
+        with STATS.phase("artifact load", path):
+            with open(path) as f:
+                artifact = json.load(f)
+        with STATS.phase("parse", path):
+            functions, events = parseABI(artifact["abi"])
+        documentation, _ = getDocumentation(path)
+        parsed = ParsedContract(artifact["contractName"], "", functions, events, "", [])
+        CACHED_INTERFACES[key] = renderMembers(parsed, documentation, False)
+
+    return CACHED_INTERFACES[key]
+
+# Returns the generated contracts that the given artifact inherits from, most derived first, as the AST ids of the
+# contracts they inherit from and their interfaces. These are the bases that its interfaces may extend.
+def getInterfaceCandidates(path):
+    if FLAT_INTERFACES:
+        return []
+
+    index = getBuildIndex(path)
+    if index is None:
+        return []
+
+    inheritance = index["inheritance"]
+    id = inheritance["ids"].get(contractKey(path))
+    if id is None:
+        return []
+
+    candidates = []
+    for base_id in inheritance["contracts"][id]["bases"][1:]:
+        base = inheritance["contracts"].get(base_id)
+        if base is None:
             continue
 
-        for node in block["nodes"]:
-            # Make sure we have documentation for this function / event
-            values = []
-            for key in ["nodeType", "visibility", "name"]:
-                if key in node:
-                    values.append(node[key])
-                else:
-                    values.append(None)
+        base_path = "%s/%s/%s.json" % (ARTIFACTS_DIR, base["key"][0], base["key"][1])
+        if base_path in EXTENDABLE and os.path.exists(base_path):
+            candidates.append((base["bases"], getInterface(base_path)))
 
-            if None in values:
-                continue
+    return candidates
 
-            # Make sure it is in fact a function or event and that is not private.
-            nodeType, visibility, name = values
-            if nodeType not in documentation:
-                #print(nodeType, name)
-                continue
-            if visibility not in ("public", "external"):
-                continue
+# Returns the interfaces that a contract's interfaces extend, rather than repeating their members: those of the most
+# derived bases whose every member it renders identically (and so has the same docs), that aren't already extended
+# through another. Constructors aren't inherited, so they're omitted from the bases that have them.
+def getInterfaceBases(members, candidates):
+    bases = []
+    extended = set()
+    for base_ids, interface in candidates:
+        if base_ids[0] in extended:
+            continue
 
-            # Mark it as an own-definition.
-            ownDefinitions[nodeType][name] = True
+        functions = dict([_ for _ in interface["functions"].items() if _[0] != "__constructor__"])
+        if len(functions) == 0 and len(interface["events"]) == 0:
+            continue
+        if [members["events"].get(_) for _ in interface["events"]] != list(interface["events"].values()):
+            continue
+        if [members["functions"].get(_) for _ in functions] != list(functions.values()):
+            continue
 
-            # Make sure it has documentation.
-            if "documentation" not in node:
-                continue
-            documentation[nodeType][name] = node["documentation"]["text"]
+        bases.append(dict(interface, functions=functions, constructor=len(functions) < len(interface["functions"])))
+        extended.update(base_ids)
+
+    return bases
+
+# Returns the source name and contract name of an artifact.
+def contractKey(path):
+    parts = path.replace("\\", "/").split("/")
+    return "/".join(parts[1:-1]), parts[-1][:-5]
+
+# Returns True if the artifact's contract name or path matches any of the globs.
+def matchesAny(path, patterns):
+    name = contractKey(path)[1]
+    path = path.replace("\\", "/")
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(path, pattern):
+            return True
+    return False
+
+# Returns True if the artifact is generated when it isn't targeted explicitly: it matches the include globs (or the
+# default ones if there are none), and none of the exclude globs.
+def isIncluded(path, args):
+    if matchesAny(path, args.exclude):
+        return False
+    return matchesAny(path, args.include or DEFAULT_INCLUDE)
+
+# Returns the artifacts for the given contract names (or globs), artifact paths or source paths.
+def resolveTargets(targets, paths):
+    resolved = []
+    for target in targets:
+        target = target.replace("\\", "/")
+        matches = []
+        for path in paths:
+            source_name, name = contractKey(path)
+            if target[-4:] == ".sol":
+                matched = source_name == target
+            elif target[-5:] == ".json" or "/" in target:
+                matched = path.replace("\\", "/") == target
+            else:
+                matched = fnmatch.fnmatchcase(name, target)
+
+            if matched:
+                matches.append(path)
+
+        if len(matches) == 0:
+            print("WARN: No artifacts for: %s" % target)
+        resolved += matches
+
+    return resolved
+
+# Returns the artifacts affected by the given changed files: artifacts, their debug files and the sources they were
+# compiled from. Anything else is ignored.
+def changedArtifacts(files, paths):
+    artifacts = {}
+    sources = {}
+    for path in paths:
+        artifacts[path.replace("\\", "/")] = path
+        sources.setdefault(contractKey(path)[0], []).append(path)
+
+    changed = []
+    for file in files:
+        file = file.strip()
+        if file == "":
+            continue
+        if os.path.isabs(file):
+            file = os.path.relpath(file)
+        file = file.replace("\\", "/")
+
+        # A recompiled artifact may only have its debug file updated.
+        if file[-9:] == ".dbg.json":
+            file = file[:-9] + ".json"
+
+        if file[-4:] == ".sol":
+            changed += sources.get(file, [])
+        elif file in artifacts:
+            changed.append(artifacts[file])
+
+    return changed
+
+# Returns the artifacts that changed since the given manifest was written (by a previous run), including new ones that
+# would be generated.
+def changedSince(manifest_file, paths, args):
+    entries, _ = readManifestFile(manifest_file)
+    changed = []
+    for path in paths:
+        if path in entries:
+            if entries[path]["artifact"] != hashFile(path):
+                changed.append(path)
+        elif isIncluded(path, args):
+            changed.append(path)
+
+    return changed
+
+# Returns the artifacts of the contracts that inherit from any of the given ones. Inheritance is only followed within
+# a compilation, as that is where the AST ids are shared.
+def findDerived(artifacts, paths, rows):
+    keys = set([contractKey(_) for _ in artifacts])
+    derived = set()
+    for build_file, group in groupArtifacts(paths, rows).items():
+        if build_file == "":
+            continue
+        index = getBuildIndex(group[0])
+        if index is None:
+            continue
 
-    return documentation, ownDefinitions
+        inheritance = index["inheritance"]
+        ids = set([inheritance["ids"][_] for _ in keys if _ in inheritance["ids"]])
+        if len(ids) == 0:
+            continue
 
-def generateABI(path):
-    keywords = [
-        "1155M",
-        "Emulator",
-        "Metatoken",
-        "Mock",
-    ]
-    skip = True
-    for keyword in keywords:
-        if keyword in path:
-            skip = False
-            break
-    if skip:
-        return
+        for contract in inheritance["contracts"].values():
+            if len(ids.intersection(contract["bases"][1:])) > 0:
+                derived.add(contract["key"])
+
+    return [_ for _ in paths if contractKey(_) in derived]
+
+# Returns the artifacts to generate, in order. Explicitly targeted contracts are generated as long as they aren't
+# excluded. Changed contracts (given by the watcher, or found from the options) and those that inherit from them are
+# generated if they are one of the explicitly targeted contracts or, if there are none, if they are included.
+def selectArtifacts(paths, args, rows, changed=None):
+    targeted = changed is not None or len(args.contracts) > 0
+    if changed is None:
+        changed = []
+        if args.changed_since is not None:
+            targeted = True
+            changed += changedSince(args.changed_since, paths, args)
+        if args.changed_files is not None:
+            targeted = True
+            if args.changed_files == "-":
+                files = stdin.read().split("\n")
+            else:
+                with open(args.changed_files) as f:
+                    files = f.read().split("\n")
+            changed += changedArtifacts(files, paths)
+
+    if not targeted:
+        return [_ for _ in paths if isIncluded(_, args)]
+
+    explicit = set(resolveTargets(args.contracts, paths))
+    selected = set()
+    for path in explicit:
+        if not matchesAny(path, args.exclude):
+            selected.add(path)
+    for path in changed + findDerived(changed, paths, rows):
+        if (path in explicit if len(explicit) > 0 else isIncluded(path, args)):
+            selected.add(path)
+
+    return [_ for _ in paths if _ in selected]
+
+# Renders the typings for the given artifact, using its previous manifest entry to skip unchanged contracts. The store
+# row is only given if the artifact hasn't been touched since it was recorded.
+# Returns None if the artifact isn't a contract, otherwise the new manifest entry, the rendered file (or None if the
+# previous render is still current), the new store row (or None if it is still current) and the serialized contract to
+# store (or None if it was already parsed).
+def generateABI(path, entry, row):
+    # If the artifact hasn't been touched since we recorded it, the compilation it came from hasn't changed since the
+    # last render, and the rendered file is still intact, there's nothing to do.
+    if row is not None and entry is not None and row["abi_hash"] == entry["abi"] and row["build_info"] == entry["build_file"]:
+        if hashFile(entry["output"]) == entry["output_hash"]:
+            return entry, None, None, None
+
+    with STATS.phase("artifact load", path):
+        stats = artifact_stats(path)
+        with open(path, "rb") as f:
+            contents = f.read()
+        artifact_hash = hash_bytes(contents)
+        build_file = getBuildFile(path) or ""
+
+    # An artifact that we've already parsed doesn't need to be decoded again. The parsed cache is timed separately from
+    # loading the artifact.
+    parsed = None
+    artifact = None
+    if entry is not None and entry["artifact"] == artifact_hash:
+        abi_hash = entry["abi"]
+        parsed = getParsed(path, abi_hash)
+    elif row is not None:
+        abi_hash = row["abi_hash"]
+        parsed = getParsed(path, abi_hash)
+
+    if parsed is None:
+        with STATS.phase("artifact load", path):
+            artifact = json.loads(contents)
+            if "contractName" not in artifact or "abi" not in artifact:
+                return None
+            abi_hash = hash_json(artifact["abi"])
+
+        # A recompiled contract usually has the same ABI.
+        parsed = getParsed(path, abi_hash)
+
+    row = {
+        "path" : path,
+        "mtime" : stats[0],
+        "size" : stats[1],
+        "debug_mtime" : stats[2],
+        "debug_size" : stats[3],
+        "source" : parsed.source if parsed is not None else artifact.get("sourceName", ""),
+        "contract" : parsed.contract if parsed is not None else artifact["contractName"],
+        "abi_hash" : abi_hash,
+        "build_info" : build_file,
+    }
 
-    with open(path) as f:
-        artifact = json.load(f)
-    if "contractName" not in artifact or "abi" not in artifact:
-        return
+    # The artifact may have been rewritten without changing.
+    if entry is not None and entry["artifact"] == artifact_hash and entry["build_file"] == build_file:
+        if hashFile(entry["output"]) == entry["output_hash"]:
+            return entry, None, row, None
 
     # Get the documentation for this artifact.
     try:
@@ -434,15 +1436,320 @@ def generateABI(path):
             "EventDefinition" : {},
             "FunctionDefinition" : {},
         }
+
+        # Without the definitions, the interface ID is that of every function (see renderInterfaceId).
         ownDefinitions = {
             "EventDefinition" : {},
             "FunctionDefinition" : {},
         }
 
-    functions, events = parseABI(artifact["abi"])
-    renderABI(artifact, functions, events, documentation, ownDefinitions)
+    # The interfaces that this contract's may extend are also rendered, as they decide which members are repeated.
+    try:
+        candidates = getInterfaceCandidates(path)
+    except Exception as e:
+        print(e.with_traceback(exc_info()[2]))
+        candidates = []
+
+    # A new compilation doesn't necessarily mean that this contract changed, so compare the parts that we render.
+    docs_hash = hash_json([documentation, ownDefinitions, [_[1] for _ in candidates]])
+    if entry is not None and entry["abi"] == abi_hash and entry["docs"] == docs_hash:
+        if hashFile(entry["output"]) == entry["output_hash"]:
+            return dict(entry, artifact=artifact_hash, build_file=build_file), None, row, None
+
+    record = None
+    if parsed is None:
+        with STATS.phase("parse", path):
+            parsed = parseContract(artifact)
+            record = dump_contract(parsed)
+
+    with STATS.phase("render", path):
+        members = renderMembers(parsed, documentation)
+        output, rendered = renderABI(parsed, members, ownDefinitions, getInterfaceBases(members, candidates))
+
+    return {
+        "artifact" : artifact_hash,
+        "build_file" : build_file,
+        "abi" : abi_hash,
+        "docs" : docs_hash,
+        "output" : output,
+        "output_hash" : hash_bytes(rendered),
+    }, rendered, row, record
+
+# Records the result of generateABI, writing the rendered file if the contents actually changed so that we don't
+# trigger any watchers.
+def applyResult(path, result):
+    if result is None:
+        MANIFEST.pop(path, None)
+        return
+
+    entry, rendered, row, record = result
+    MANIFEST[path] = entry
+    if record is not None and STORE is not None:
+        STORE.update_parsed(parsedKey(path, entry["abi"]), GENERATOR_HASH, record)
+    if row is not None and STORE is not None:
+        STORE.update_artifact(row)
+
+    # Commit as we go, so that flatten_all.py isn't locked out of the store file for the whole run.
+    if STORE is not None and (record is not None or row is not None):
+        STORE.commit()
+    if rendered is not None:
+        if CHECK:
+            if not hasContents(entry["output"], rendered):
+                STALE_OUTPUTS.append(entry["output"])
+            return
+
+        with STATS.phase("write", path):
+            written = writeIfChanged(entry["output"], rendered)
+        if written:
+            print("Updated: %s" % entry["output"])
+
+# Initializer for the worker processes.
+def initWorker(stats, cache_limit, codecs, flat_interfaces, check):
+    global WORKER_STORE, BUILD_INFO_CACHE_LIMIT, CHECK
+    STATS.enabled = stats
+    BUILD_INFO_CACHE_LIMIT = cache_limit
+    CHECK = check
+    if codecs:
+        enableCodecs()
+    if flat_interfaces:
+        enableFlatInterfaces()
+    WORKER_STORE = ContractStore(read_only=check)
+
+# Worker for parallel runs: builds the index for a compilation so that the other workers only need to read it.
+def indexBuild(path):
+    STATS.reset()
+
+    log = io.StringIO()
+    with redirect_stdout(log):
+        try:
+            getBuildIndex(path)
+        except Exception as e:
+            print(e)
 
-for root, dirs, files in os.walk("artifacts"):
-    for f in files:
-        if f[-5:] == ".json" and f[-9:] != ".dbg.json":
-            generateABI(os.path.join(root, f))
\ No newline at end of file
+    # The other workers only read the index, so the build info won't be needed again. A check doesn't write the index,
+    # so it is sent back to be passed on to the workers instead.
+    with redirect_stdout(io.StringIO()):
+        build_file = getBuildFile(path)
+        releaseBuildInfo(build_file)
+    return log.getvalue(), STATS.snapshot(), storedBuildIndex(build_file) if CHECK else None
+
+# Worker for parallel runs: generates a shard of artifacts, capturing their logs so that they don't interleave.
+def generateShard(shard):
+    global EXTENDABLE
+    forgetRemovedBuilds()
+    STATS.reset()
+
+    build_file, artifacts, EXTENDABLE, index = shard
+    if index is not None and build_file not in CACHED_BUILD_INDEX:
+        cacheBuildIndex(build_file, index)
+
+    results = []
+    for path, entry, row in artifacts:
+        log = io.StringIO()
+        with redirect_stdout(log):
+            result = generateABI(path, entry, row)
+        results.append((path, result, log.getvalue()))
+
+    releaseBuildInfo(build_file)
+    return results, STATS.snapshot()
+
+# Groups the artifacts by the build info of their compilation, so that each build info is loaded, used and released
+# once. Artifacts without a build info are grouped under "". Unchanged artifacts use the build info in their store row.
+def groupArtifacts(paths, rows):
+    groups = {}
+    with redirect_stdout(io.StringIO()):
+        for path in paths:
+            if path in rows:
+                build_file = rows[path]["build_info"]
+            else:
+                build_file = getBuildFile(path) or ""
+            groups.setdefault(build_file, []).append(path)
+    return groups
+
+# Splits the artifacts into shards for the workers, keeping artifacts from the same compilation together so that each
+# worker reads a given build info only once.
+def shardArtifacts(groups, rows, jobs):
+    shards = []
+    for build_file in sorted(groups.keys()):
+        group = groups[build_file]
+        size = max(1, -(-len(group) // jobs))
+        for i in range(0, len(group), size):
+            artifacts = [(path, MANIFEST.get(path), rows.get(path)) for path in group[i:i + size]]
+            shards.append((build_file, artifacts, EXTENDABLE, storedBuildIndex(build_file) if CHECK else None))
+
+    return shards
+
+# Returns the store rows of the artifacts that haven't been touched since they were recorded.
+def unchangedRows(changed):
+    rows = {}
+    if STORE is not None:
+        for path, row in STORE.artifacts().items():
+            if path not in changed:
+                rows[path] = row
+    return rows
+
+# Generates the given artifacts, with the store rows of those that are unchanged.
+def generateAll(paths, rows, jobs, executor):
+    groups = groupArtifacts(paths, rows)
+    if executor is None:
+        for build_file in sorted(groups.keys()):
+            for path in groups[build_file]:
+                applyResult(path, generateABI(path, MANIFEST.get(path), rows.get(path)))
+            releaseBuildInfo(build_file)
+        return
+
+    # Make sure each compilation is indexed before its artifacts are split across workers. A check doesn't write the
+    # indexes, so they're passed to the workers with their shards instead of each worker indexing them again.
+    unindexed = []
+    for build_file in sorted(groups.keys()):
+        if build_file == "" or (CHECK and build_file in CACHED_BUILD_INDEX):
+            continue
+        if CHECK or not os.path.exists("%s/%s" % (INDEX_DIR, build_file)):
+            unindexed.append(build_file)
+    for build_file, (log, stats, index) in zip(unindexed, executor.map(indexBuild, [groups[_][0] for _ in unindexed])):
+        print(log, end="")
+        STATS.merge(stats)
+        if index is not None:
+            cacheBuildIndex(build_file, index)
+    shards = shardArtifacts(groups, rows, jobs)
+
+    # Apply the results in order so that the output is deterministic.
+    for results, stats in executor.map(generateShard, shards):
+        STATS.merge(stats)
+        for path, result, log in results:
+            print(log, end="")
+            applyResult(path, result)
+
+def isArtifact(path):
+    if path[-5:] != ".json" or path[-9:] == ".dbg.json":
+        return False
+    return not path.replace("\\", "/").startswith(BUILD_INFO_DIR + "/")
+
+# Regenerates only the artifacts affected by the changed files reported by the watcher.
+def regenerate(changed, args, executor):
+    paths, changed_stats = STORE.scan_artifacts(ARTIFACTS_DIR, isArtifact)
+    STORE.commit()
+
+    # Forget about any artifacts that were removed.
+    existing = set(paths)
+    for path in list(MANIFEST.keys()):
+        if path not in existing:
+            del MANIFEST[path]
+
+    rows = unchangedRows(changed_stats)
+    EXTENDABLE.clear()
+    EXTENDABLE.update([_ for _ in paths if isIncluded(_, args)])
+    generateAll(selectArtifacts(paths, args, rows, changedArtifacts(changed, paths)), rows, args.jobs, executor)
+    writeManifest()
+    pruneParsed()
+    STORE.commit()
+    pruneBuildIndexes()
+    reportStats()
+
+def reportStats(stats_json=None):
+    if not STATS.enabled:
+        return
+
+    STATS.report(PHASES)
+    if stats_json is not None:
+        STATS.write(stats_json)
+    STATS.reset()
+
+# Reports the outputs that --check found to be stale, exiting with an error if there are any.
+def reportCheck(count):
+    if len(STALE_OUTPUTS) == 0:
+        print("All %s typings are up to date" % count)
+        return
+
+    for output in sorted(STALE_OUTPUTS):
+        print("Stale: %s" % output)
+    print("%s of %s typings are stale, run `yarn genabi` to update them" % (len(STALE_OUTPUTS), count))
+    exit(1)
+
+def main():
+    global STORE, BUILD_INFO_CACHE_LIMIT, CHECK, EXTENDABLE_GLOBS
+
+    parser = argparse.ArgumentParser(description="Generates the typings for the compiled contract artifacts.")
+    parser.add_argument("contracts", nargs="*",
+        help="only generate these contracts, by name (or glob), artifact path or source path")
+    parser.add_argument("--include", action="append", default=[],
+        help="generate the contracts whose name or artifact path matches this glob (default: %s)" % ", ".join(DEFAULT_INCLUDE))
+    parser.add_argument("--exclude", action="append", default=[],
+        help="don't generate the contracts whose name or artifact path matches this glob")
+    parser.add_argument("--changed-since", metavar="MANIFEST",
+        help="only generate the contracts that changed since this manifest (a copy of %s) was written, and those that inherit from them" % MANIFEST_FILE)
+    parser.add_argument("--changed-files", metavar="FILE",
+        help="only generate the contracts affected by the changed artifacts or sources listed in this file (- for stdin), and those that inherit from them")
+    parser.add_argument("--jobs", "-j", type=int,
+        help="the number of worker processes to render with (default: 1, or up to %s with --check)" % CHECK_JOBS)
+    parser.add_argument("--watch", "-w", action="store_true", help="keep running, regenerating as artifacts change")
+    parser.add_argument("--stats", "--profile", action="store_true", help="print the time spent in each phase")
+    parser.add_argument("--stats-json", help="also write the time spent in each phase to this file")
+    parser.add_argument("--build-info-cache", type=int, default=BUILD_INFO_CACHE_LIMIT // (1024 * 1024),
+        help="the total size of the build info files to keep in memory, in MB")
+    parser.add_argument("--codecs", action="store_true",
+        help="also generate encoders and decoders for the functions and events (see tests/abiCodec.ts)")
+    parser.add_argument("--flat-interfaces", action="store_true",
+        help="render every member of each contract's interfaces, rather than extending those of the contracts it inherits from")
+    parser.add_argument("--check", action="store_true",
+        help="only check that the typings are up to date, listing those that aren't and failing if there are any, without writing anything")
+    args = parser.parse_args()
+    if args.check and args.watch:
+        parser.error("--check can't be used with --watch")
+    CHECK = args.check
+    if args.jobs is None:
+        args.jobs = min(CHECK_JOBS, os.cpu_count() or 1) if CHECK else 1
+    STATS.enabled = args.stats or args.stats_json is not None
+    BUILD_INFO_CACHE_LIMIT = args.build_info_cache * 1024 * 1024
+    if args.codecs:
+        enableCodecs()
+    if args.flat_interfaces:
+        enableFlatInterfaces()
+    EXTENDABLE_GLOBS = [sorted(args.include or DEFAULT_INCLUDE), sorted(args.exclude)]
+
+    STORE = ContractStore(read_only=CHECK)
+    readManifest()
+
+    # The workers are kept for the lifetime of the process, so their caches stay warm while watching.
+    executor = None
+    if args.jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=args.jobs, initializer=initWorker,
+            initargs=(STATS.enabled, BUILD_INFO_CACHE_LIMIT, CODECS, FLAT_INTERFACES, CHECK))
+
+    try:
+        with STATS.phase("walk"):
+            paths, changed = STORE.scan_artifacts(ARTIFACTS_DIR, isArtifact)
+            STORE.commit()
+        rows = unchangedRows(changed)
+        EXTENDABLE.update([_ for _ in paths if isIncluded(_, args)])
+        selected = selectArtifacts(paths, args, rows)
+        generateAll(selected, rows, args.jobs, executor)
+        if CHECK:
+            reportStats(args.stats_json)
+            reportCheck(len([_ for _ in selected if _ in MANIFEST]))
+            return
+        STORE.commit()
+
+        # Forget about any artifacts that no longer exist.
+        existing = set(paths)
+        for path in list(MANIFEST.keys()):
+            if path not in existing:
+                del MANIFEST[path]
+
+        writeManifest()
+        pruneParsed()
+        STORE.commit()
+        pruneBuildIndexes()
+        reportStats(args.stats_json)
+
+        if args.watch:
+            watch([ARTIFACTS_DIR], [".json"], lambda changed: regenerate(changed, args, executor))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        STORE.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import json
+import mmap
+import re
+
+# Reads only the selected parts of a JSON file, skipping over everything else without decoding it. Build info files
+# hold the solc input and output for every source in a compilation, so they can be hundreds of megabytes while we only
+# need a small part of their ASTs.
+#
+# A selection mirrors the shape of the values it selects: a dict selects the given keys of an object ("*" selecting
+# every key), a single-element list selects from every element of an array, and True selects the whole value. Values
+# that don't match the shape of their selection are left out, as are keys that aren't selected. For example, this
+# selects the node type of every top-level node of every source's AST:
+#
+#     {"output": {"sources": {"*": {"ast": {"nodes": [{"nodeType": True}]}}}}}
+
+WHITESPACE_RE = re.compile(rb"[ \t\n\r]*")
+STRING_RE = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+SCALAR_RE = re.compile(rb"-?[0-9][0-9.eE+-]*|true|false|null")
+SKIP_RE = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]', re.S)
+OPEN_OBJECT, CLOSE_OBJECT, OPEN_ARRAY, CLOSE_ARRAY = b"{}[]"
+
+# Returned for values that don't match their selection.
+MISSING = object()
+
+# Returns the selected parts of the JSON file.
+def select_file(path, selection):
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            value, end = select(data, 0, selection)
+            if WHITESPACE_RE.match(data, end).end() != len(data):
+                raise ValueError("Extra data at %s in: %s" % (end, path))
+
+    if value is MISSING:
+        raise ValueError("Unexpected JSON structure in: %s" % path)
+    return value
+
+# Returns the selected parts of the value at the given position, and the position after it.
+def select(data, pos, selection):
+    pos = skip_whitespace(data, pos)
+    if selection is True:
+        end = value_end(data, pos)
+        return json.loads(data[pos:end]), end
+
+    token = data[pos:pos + 1]
+    if isinstance(selection, dict) and token == b"{":
+        value = {}
+        pos = skip_whitespace(data, pos + 1)
+        if data[pos:pos + 1] == b"}":
+            return value, pos + 1
+
+        while True:
+            key, pos = read_key(data, pos)
+            if key in selection or "*" in selection:
+                item, pos = select(data, pos, selection.get(key, selection.get("*")))
+                if item is not MISSING:
+                    value[key] = item
+            else:
+                pos = value_end(data, skip_whitespace(data, pos))
+
+            pos, done = read_separator(data, pos, b"}")
+            if done:
+                return value, pos
+
+    if isinstance(selection, list) and token == b"[":
+        value = []
+        pos = skip_whitespace(data, pos + 1)
+        if data[pos:pos + 1] == b"]":
+            return value, pos + 1
+
+        while True:
+            item, pos = select(data, pos, selection[0])
+            if item is not MISSING:
+                value.append(item)
+
+            pos, done = read_separator(data, pos, b"]")
+            if done:
+                return value, pos
+
+    return MISSING, value_end(data, pos)
+
+def skip_whitespace(data, pos):
+    return WHITESPACE_RE.match(data, pos).end()
+
+# Reads an object key and the colon after it, returning the key and the position of its value.
+def read_key(data, pos):
+    pos = skip_whitespace(data, pos)
+    match = STRING_RE.match(data, pos)
+    if match is None:
+        raise ValueError("Expected a key at %s" % pos)
+
+    key = json.loads(match.group(0))
+    pos = skip_whitespace(data, match.end())
+    if data[pos:pos + 1] != b":":
+        raise ValueError("Expected ':' at %s" % pos)
+    return key, pos + 1
+
+# Reads the comma between values, or the closing bracket, returning the position after it and if it was the closing
+# bracket.
+def read_separator(data, pos, closing):
+    pos = skip_whitespace(data, pos)
+    token = data[pos:pos + 1]
+    if token == b",":
+        return pos + 1, False
+    if token == closing:
+        return pos + 1, True
+    raise ValueError("Expected ',' or '%s' at %s" % (closing.decode(), pos))
+
+# Returns the position after the value at the given position, without decoding it.
+def value_end(data, pos):
+    token = data[pos:pos + 1]
+    if token == b'"':
+        match = STRING_RE.match(data, pos)
+        if match is None:
+            raise ValueError("Unterminated string at %s" % pos)
+        return match.end()
+
+    if token != b"{" and token != b"[":
+        match = SCALAR_RE.match(data, pos)
+        if match is None:
+            raise ValueError("Unexpected value at %s" % pos)
+        return match.end()
+
+    # Only the brackets matter when skipping an object or array, as long as we step over the strings whole.
+    depth = 0
+    search = SKIP_RE.search
+    while True:
+        match = search(data, pos)
+        if match is None:
+            raise ValueError("Unterminated value")
+
+        pos = match.end()
+        token = data[match.start()]
+        if token == OPEN_OBJECT or token == OPEN_ARRAY:
+            depth += 1
+        elif token == CLOSE_OBJECT or token == CLOSE_ARRAY:
+            depth -= 1
+            if depth == 0:
+                return pos
@@ -0,0 +1,140 @@
+# A pure Python Keccak-256, as used by Ethereum for selectors and topics. This is the original Keccak padding, which
+# differs from the standardized SHA3-256 in hashlib. OpenSSL 3.2 and later provide Keccak-256 itself, which hashlib
+# exposes by name, so that is used instead when it's available.
+
+import hashlib
+
+try:
+    hashlib.new("KECCAK-256")
+    HASHLIB_KECCAK = True
+except ValueError:
+    HASHLIB_KECCAK = False
+
+MASK = (1 << 64) - 1
+RATE = 136
+
+ROUND_CONSTANTS = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+
+# The permutation, unrolled with the lanes (indexed by x + 5 * y) in locals, which is several times faster than looping
+# over a list in Python. Each lane of the state is rotated by the rho offsets and moved to its pi position in one step,
+# into the b lanes.
+def keccak_f(state):
+    (s0, s1, s2, s3, s4, s5, s6, s7, s8, s9, s10, s11, s12,
+        s13, s14, s15, s16, s17, s18, s19, s20, s21, s22, s23, s24) = state
+    for constant in ROUND_CONSTANTS:
+        # Theta
+        c0 = s0 ^ s5 ^ s10 ^ s15 ^ s20
+        c1 = s1 ^ s6 ^ s11 ^ s16 ^ s21
+        c2 = s2 ^ s7 ^ s12 ^ s17 ^ s22
+        c3 = s3 ^ s8 ^ s13 ^ s18 ^ s23
+        c4 = s4 ^ s9 ^ s14 ^ s19 ^ s24
+        d0 = c4 ^ (((c1 << 1) | (c1 >> 63)) & MASK)
+        d1 = c0 ^ (((c2 << 1) | (c2 >> 63)) & MASK)
+        d2 = c1 ^ (((c3 << 1) | (c3 >> 63)) & MASK)
+        d3 = c2 ^ (((c4 << 1) | (c4 >> 63)) & MASK)
+        d4 = c3 ^ (((c0 << 1) | (c0 >> 63)) & MASK)
+
+        # Rho and pi
+        b0 = s0 ^ d0
+        t = s1 ^ d1
+        b10 = ((t << 1) | (t >> 63)) & MASK
+        t = s2 ^ d2
+        b20 = ((t << 62) | (t >> 2)) & MASK
+        t = s3 ^ d3
+        b5 = ((t << 28) | (t >> 36)) & MASK
+        t = s4 ^ d4
+        b15 = ((t << 27) | (t >> 37)) & MASK
+        t = s5 ^ d0
+        b16 = ((t << 36) | (t >> 28)) & MASK
+        t = s6 ^ d1
+        b1 = ((t << 44) | (t >> 20)) & MASK
+        t = s7 ^ d2
+        b11 = ((t << 6) | (t >> 58)) & MASK
+        t = s8 ^ d3
+        b21 = ((t << 55) | (t >> 9)) & MASK
+        t = s9 ^ d4
+        b6 = ((t << 20) | (t >> 44)) & MASK
+        t = s10 ^ d0
+        b7 = ((t << 3) | (t >> 61)) & MASK
+        t = s11 ^ d1
+        b17 = ((t << 10) | (t >> 54)) & MASK
+        t = s12 ^ d2
+        b2 = ((t << 43) | (t >> 21)) & MASK
+        t = s13 ^ d3
+        b12 = ((t << 25) | (t >> 39)) & MASK
+        t = s14 ^ d4
+        b22 = ((t << 39) | (t >> 25)) & MASK
+        t = s15 ^ d0
+        b23 = ((t << 41) | (t >> 23)) & MASK
+        t = s16 ^ d1
+        b8 = ((t << 45) | (t >> 19)) & MASK
+        t = s17 ^ d2
+        b18 = ((t << 15) | (t >> 49)) & MASK
+        t = s18 ^ d3
+        b3 = ((t << 21) | (t >> 43)) & MASK
+        t = s19 ^ d4
+        b13 = ((t << 8) | (t >> 56)) & MASK
+        t = s20 ^ d0
+        b14 = ((t << 18) | (t >> 46)) & MASK
+        t = s21 ^ d1
+        b24 = ((t << 2) | (t >> 62)) & MASK
+        t = s22 ^ d2
+        b9 = ((t << 61) | (t >> 3)) & MASK
+        t = s23 ^ d3
+        b19 = ((t << 56) | (t >> 8)) & MASK
+        t = s24 ^ d4
+        b4 = ((t << 14) | (t >> 50)) & MASK
+
+        # Chi and iota
+        s0 = b0 ^ (~b1 & b2) ^ constant
+        s1 = b1 ^ (~b2 & b3)
+        s2 = b2 ^ (~b3 & b4)
+        s3 = b3 ^ (~b4 & b0)
+        s4 = b4 ^ (~b0 & b1)
+        s5 = b5 ^ (~b6 & b7)
+        s6 = b6 ^ (~b7 & b8)
+        s7 = b7 ^ (~b8 & b9)
+        s8 = b8 ^ (~b9 & b5)
+        s9 = b9 ^ (~b5 & b6)
+        s10 = b10 ^ (~b11 & b12)
+        s11 = b11 ^ (~b12 & b13)
+        s12 = b12 ^ (~b13 & b14)
+        s13 = b13 ^ (~b14 & b10)
+        s14 = b14 ^ (~b10 & b11)
+        s15 = b15 ^ (~b16 & b17)
+        s16 = b16 ^ (~b17 & b18)
+        s17 = b17 ^ (~b18 & b19)
+        s18 = b18 ^ (~b19 & b15)
+        s19 = b19 ^ (~b15 & b16)
+        s20 = b20 ^ (~b21 & b22)
+        s21 = b21 ^ (~b22 & b23)
+        s22 = b22 ^ (~b23 & b24)
+        s23 = b23 ^ (~b24 & b20)
+        s24 = b24 ^ (~b20 & b21)
+
+    state[:] = (s0, s1, s2, s3, s4, s5, s6, s7, s8, s9, s10, s11, s12,
+        s13, s14, s15, s16, s17, s18, s19, s20, s21, s22, s23, s24)
+
+def keccak256(data):
+    if HASHLIB_KECCAK:
+        return hashlib.new("KECCAK-256", data).digest()
+
+    padded = bytearray(data)
+    padded.append(0x01)
+    padded.extend(b"\0" * (-len(padded) % RATE))
+    padded[-1] |= 0x80
+
+    state = [0] * 25
+    for offset in range(0, len(padded), RATE):
+        for i in range(RATE // 8):
+            state[i] ^= int.from_bytes(padded[offset + i * 8:offset + i * 8 + 8], "little")
+        keccak_f(state)
+
+    return b"".join(lane.to_bytes(8, "little") for lane in state[:4])
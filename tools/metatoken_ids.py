@@ -0,0 +1,294 @@
+import argparse
+import sys
+from time import perf_counter
+
+try:
+    import numpy as np
+except ImportError:
+    # Without NumPy the IDs are packed one at a time, which is much slower but writes the same fixtures.
+    np = None
+
+# Metatoken IDs are the address of the extension in the upper 160 bits and the NFT ID in the lower 96 (see
+# getMetatokenID in tests/metatokens/index.ts).
+TOKEN_ADDRESS_SHIFT = 96
+MAX_NFT_ID = (1 << TOKEN_ADDRESS_SHIFT) - 1
+MAX_ADDRESS = (1 << 160) - 1
+
+# NumPy has no 256 bit integers, so the IDs are packed as four 64 bit limbs (least significant first), the addresses as
+# three and the NFT IDs as two. The address starts halfway through the second limb of the ID, so each of its limbs is
+# split across two.
+ID_LIMBS = 4
+ADDRESS_LIMBS = 3
+NFT_LIMBS = 2
+LIMB_MASK = (1 << 64) - 1
+
+# The width of each value in the fixtures, in hex digits.
+ID_DIGITS = 64
+ADDRESS_DIGITS = 40
+NFT_DIGITS = 24
+
+# The number of IDs packed at once when streaming, which bounds the memory used.
+DEFAULT_CHUNK = 1 << 20
+
+# The constants of splitmix64, which generates the random addresses and NFT IDs from their index so that the fixtures
+# are the same with or without NumPy, and however they are chunked.
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+MIX_MULTIPLIERS = [0xBF58476D1CE4E5B9, 0x94D049BB133111EB]
+ADDRESS_STREAM = 0x5EED
+
+if np is not None:
+    HALF = np.uint64(32)
+    HALF_MASK = np.uint64(0xFFFFFFFF)
+
+    # Hex is converted a byte at a time, as a pair of digits read or written as one 16 bit value: the pair of digits
+    # for each byte, and the byte for each pair of digits (or 256 if they aren't both digits).
+    HEX_PAIRS = np.frombuffer(bytes("".join(["%02x" % _ for _ in range(256)]), "ascii"), np.uint16)
+    HEX_PAIR_VALUES = np.full(1 << 16, 256, np.uint16)
+    for digits in ["%02x" % _ for _ in range(256)]:
+        for pair in set([digits, digits.upper(), digits[0] + digits[1].upper(), digits[0].upper() + digits[1]]):
+            HEX_PAIR_VALUES[np.frombuffer(bytes(pair, "ascii"), np.uint16)[0]] = int(digits, 16)
+
+# Returns the metatoken ID for the extension's address and the NFT ID.
+def pack_id(address, nft):
+    if nft < 0 or nft > MAX_NFT_ID:
+        raise ValueError("NFT ID too large: %s" % nft)
+    if address < 0 or address > MAX_ADDRESS:
+        raise ValueError("ID overflow for address: 0x%x" % address)
+    return (address << TOKEN_ADDRESS_SHIFT) | nft
+
+# Returns the extension's address and the NFT ID of a metatoken ID.
+def unpack_id(id):
+    return id >> TOKEN_ADDRESS_SHIFT, id & MAX_NFT_ID
+
+def splitmix64(state):
+    z = (state + GOLDEN_GAMMA) & LIMB_MASK
+    z = ((z ^ (z >> 30)) * MIX_MULTIPLIERS[0]) & LIMB_MASK
+    z = ((z ^ (z >> 27)) * MIX_MULTIPLIERS[1]) & LIMB_MASK
+    return z ^ (z >> 31)
+
+# Returns the given number of random addresses for the seed.
+def random_addresses(count, seed):
+    addresses = []
+    for i in range(count):
+        state = (seed ^ ADDRESS_STREAM) + 3 * i * GOLDEN_GAMMA
+        limbs = [splitmix64((state + j * GOLDEN_GAMMA) & LIMB_MASK) for j in range(ADDRESS_LIMBS)]
+        addresses.append(((limbs[2] >> 32) << 128) | (limbs[1] << 64) | limbs[0])
+    return addresses
+
+# Returns the random NFT ID with the given index for the seed.
+def random_nft(index, seed):
+    state = seed + 2 * index * GOLDEN_GAMMA
+    return ((splitmix64((state + GOLDEN_GAMMA) & LIMB_MASK) >> 32) << 64) | splitmix64(state & LIMB_MASK)
+
+# Converts the integers to an array of their limbs.
+def to_limbs(values, count):
+    limbs = np.empty((len(values), count), np.uint64)
+    for i, value in enumerate(values):
+        if value < 0 or value >> (64 * count) != 0:
+            raise ValueError("Value too large for %s limbs: %s" % (count, value))
+        for j in range(count):
+            limbs[i, j] = (value >> (64 * j)) & LIMB_MASK
+    return limbs
+
+# Converts an array of limbs back to integers.
+def from_limbs(limbs):
+    values = []
+    for row in limbs.tolist():
+        value = 0
+        for limb in reversed(row):
+            value = (value << 64) | limb
+        values.append(value)
+    return values
+
+# Raises an error with the first of the values that are out of range, if any.
+def check_range(out_of_range, limbs, message):
+    invalid = np.flatnonzero(out_of_range)
+    if len(invalid) > 0:
+        raise ValueError("%s at index %s: 0x%x" % (message, invalid[0], from_limbs(limbs[invalid[:1]])[0]))
+
+# Packs the addresses and NFT IDs (as limbs) into metatoken IDs, checking that neither overflows its bits.
+def pack_limbs(addresses, nfts):
+    check_range(nfts[:, 1] >> HALF != 0, nfts, "NFT ID too large")
+    check_range(addresses[:, 2] >> HALF != 0, addresses, "ID overflow for address")
+
+    ids = np.empty((len(nfts), ID_LIMBS), np.uint64)
+    ids[:, 0] = nfts[:, 0]
+    ids[:, 1] = nfts[:, 1] | (addresses[:, 0] << HALF)
+    ids[:, 2] = (addresses[:, 0] >> HALF) | (addresses[:, 1] << HALF)
+    ids[:, 3] = (addresses[:, 1] >> HALF) | (addresses[:, 2] << HALF)
+    return ids
+
+# Unpacks metatoken IDs (as limbs) into their addresses and NFT IDs.
+def unpack_limbs(ids):
+    addresses = np.empty((len(ids), ADDRESS_LIMBS), np.uint64)
+    addresses[:, 0] = (ids[:, 1] >> HALF) | (ids[:, 2] << HALF)
+    addresses[:, 1] = (ids[:, 2] >> HALF) | (ids[:, 3] << HALF)
+    addresses[:, 2] = ids[:, 3] >> HALF
+
+    nfts = np.empty((len(ids), NFT_LIMBS), np.uint64)
+    nfts[:, 0] = ids[:, 0]
+    nfts[:, 1] = ids[:, 1] & HALF_MASK
+    return addresses, nfts
+
+# Returns the random NFT IDs (as limbs) with the given indices for the seed. The same as random_nft, but vectorized.
+def random_nft_limbs(indices, seed):
+    with np.errstate(over="ignore"):
+        states = np.uint64(seed & LIMB_MASK) + indices * np.uint64(2 * GOLDEN_GAMMA & LIMB_MASK)
+        nfts = np.empty((len(indices), NFT_LIMBS), np.uint64)
+        nfts[:, 0] = splitmix64_limbs(states)
+        nfts[:, 1] = splitmix64_limbs(states + np.uint64(GOLDEN_GAMMA)) >> HALF
+    return nfts
+
+def splitmix64_limbs(states):
+    z = states + np.uint64(GOLDEN_GAMMA)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(MIX_MULTIPLIERS[0])
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(MIX_MULTIPLIERS[1])
+    return z ^ (z >> np.uint64(31))
+
+# Renders the limbs as fixed width hex, one row of ASCII per value ("0x", the digits and a newline).
+def format_hex(limbs, digits):
+    count = limbs.shape[1]
+    data = limbs[:, ::-1].astype(">u8").view(np.uint8).reshape(len(limbs), count * 8)[:, count * 8 - digits // 2:]
+
+    rows = np.empty((len(limbs), digits + 3), np.uint8)
+    rows[:, 0] = ord("0")
+    rows[:, 1] = ord("x")
+    rows[:, 2:-1] = HEX_PAIRS[data].view(np.uint8)
+    rows[:, -1] = ord("\n")
+    return rows
+
+# Parses hex values, one per line, into limbs. Lines that all have the same width ("0x" and the digits), like the
+# fixtures, are parsed as a whole.
+def parse_hex(data, digits, count):
+    if not data.endswith(b"\n"):
+        data += b"\n"
+
+    width = digits + 3
+    if len(data) % width == 0:
+        rows = np.frombuffer(data, np.uint8).reshape(len(data) // width, width)
+        values = HEX_PAIR_VALUES[np.ascontiguousarray(rows[:, 2:-1]).view(np.uint16)]
+        if (rows[:, 0] == ord("0")).all() and (rows[:, 1] | 0x20 == ord("x")).all() and (rows[:, -1] == ord("\n")).all() and (values < 256).all():
+            data = np.zeros((len(rows), count * 8), np.uint8)
+            data[:, count * 8 - digits // 2:] = values
+            return data.view(">u8")[:, ::-1].astype(np.uint64)
+
+    return to_limbs([int(_, 16) for _ in data.split()], count)
+
+# Yields the metatoken IDs of every extension in turn as fixture lines, with either the NFT IDs from the first onwards or
+# random ones, a chunk at a time.
+def generate_ids(addresses, count, first=0, seed=None, chunk=DEFAULT_CHUNK):
+    if seed is None and first + count - 1 > MAX_NFT_ID:
+        raise ValueError("NFT ID too large: %s" % (first + count - 1))
+
+    total = len(addresses) * count
+    if np is None:
+        for start in range(0, total, chunk):
+            lines = []
+            for i in range(start, min(start + chunk, total)):
+                nft = first + i % count if seed is None else random_nft(i, seed)
+                lines.append("0x%064x\n" % pack_id(addresses[i // count], nft))
+            yield "".join(lines).encode()
+        return
+
+    address_limbs = to_limbs(addresses, ADDRESS_LIMBS)
+    first_limbs = to_limbs([first], NFT_LIMBS)[0]
+    for start in range(0, total, chunk):
+        indices = np.arange(start, min(start + chunk, total), dtype=np.uint64)
+        if seed is None:
+            nfts = np.empty((len(indices), NFT_LIMBS), np.uint64)
+            nfts[:, 0] = first_limbs[0] + indices % np.uint64(count)
+            nfts[:, 1] = first_limbs[1] + (nfts[:, 0] < first_limbs[0])
+        else:
+            nfts = random_nft_limbs(indices, seed)
+        yield format_hex(pack_limbs(address_limbs[indices // np.uint64(count)], nfts), ID_DIGITS).tobytes()
+
+# Yields the addresses and NFT IDs of the metatoken IDs, one per line, as fixture lines with the address and NFT ID
+# separated by a space, a chunk at a time.
+def unpack_ids(file, chunk=DEFAULT_CHUNK):
+    remainder = b""
+    while True:
+        data = file.read(chunk * (ID_DIGITS + 3))
+        if len(data) == 0:
+            if len(remainder.strip()) == 0:
+                return
+            data, remainder = remainder, b""
+        else:
+            # Only parse whole lines, keeping the rest for the next chunk.
+            data = remainder + data
+            end = data.rfind(b"\n") + 1
+            data, remainder = data[:end], data[end:]
+            if len(data.strip()) == 0:
+                continue
+
+        if np is None:
+            lines = []
+            for line in data.split():
+                address, nft = unpack_id(int(line, 16))
+                lines.append("0x%040x 0x%024x\n" % (address, nft))
+            yield "".join(lines).encode()
+            continue
+
+        addresses, nfts = unpack_limbs(parse_hex(data, ID_DIGITS, ID_LIMBS))
+        rows = np.hstack([format_hex(addresses, ADDRESS_DIGITS), format_hex(nfts, NFT_DIGITS)])
+        rows[:, ADDRESS_DIGITS + 2] = ord(" ")
+        yield rows.tobytes()
+
+def read_addresses(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if np is None:
+        return [int(_, 16) for _ in data.split()]
+    return from_limbs(parse_hex(data, ADDRESS_DIGITS, ADDRESS_LIMBS))
+
+def main():
+    parser = argparse.ArgumentParser(description="Packs and unpacks metatoken IDs in bulk, for the fixtures of load tests.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pack = commands.add_parser("pack", help="write the metatoken IDs of the NFT IDs of every extension, one per line")
+    extensions = pack.add_mutually_exclusive_group(required=True)
+    extensions.add_argument("--extensions", metavar="FILE", help="the addresses of the extensions, one per line")
+    extensions.add_argument("--random-extensions", type=int, metavar="COUNT", help="use this many random extension addresses")
+    pack.add_argument("--ids", type=int, required=True, help="the number of NFT IDs of each extension")
+    pack.add_argument("--first-id", type=int, default=0, help="the first NFT ID of each extension")
+    pack.add_argument("--random-ids", action="store_true", help="use random NFT IDs rather than consecutive ones")
+    pack.add_argument("--seed", type=int, default=0, help="the seed of the random addresses and NFT IDs")
+
+    unpack = commands.add_parser("unpack", help="write the address and NFT ID of each metatoken ID, one per line")
+    unpack.add_argument("file", help="the metatoken IDs, one per line (- for stdin)")
+
+    for command in [pack, unpack]:
+        command.add_argument("--output", "-o", help="the fixture file to write (default: stdout)")
+        command.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="the number of IDs to pack at once")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        if args.extensions is not None:
+            addresses = read_addresses(args.extensions)
+        else:
+            addresses = random_addresses(args.random_extensions, args.seed)
+        chunks = generate_ids(addresses, args.ids, args.first_id, args.seed if args.random_ids else None, args.chunk)
+    else:
+        input = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+        chunks = unpack_ids(input, args.chunk)
+
+    start = perf_counter()
+    lines = 0
+    output = sys.stdout.buffer if args.output is None else open(args.output, "wb")
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+            lines += chunk.count(b"\n")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.output is not None:
+            output.close()
+        if args.command == "unpack" and args.file != "-":
+            input.close()
+
+    if args.output is not None:
+        print("Wrote %s lines to %s in %.2fs%s" % (lines, args.output, perf_counter() - start, "" if np is not None else " (without NumPy)"))
+
+if __name__ == "__main__":
+    main()
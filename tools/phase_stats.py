@@ -0,0 +1,84 @@
+import json
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+# Records the time spent in, and the number of times through, each phase of a tool, both overall and per contract.
+# Does nothing unless enabled, so the phases can be left in place. Phases may be recorded from multiple threads.
+class Stats:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.contracts = {}
+
+    @contextmanager
+    def phase(self, name, contract=None):
+        if not self.enabled:
+            yield
+            return
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, contract, perf_counter() - start)
+
+    def add(self, name, contract, seconds, count=1):
+        with self.lock:
+            totals = self.phases.setdefault(name, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += count
+
+            if contract is not None:
+                totals = self.contracts.setdefault(contract, {}).setdefault(name, [0.0, 0])
+                totals[0] += seconds
+                totals[1] += count
+
+    # Returns the recorded stats as plain values, e.g. to send them back from a worker process.
+    def snapshot(self):
+        return {
+            "phases" : self.phases,
+            "contracts" : self.contracts,
+        }
+
+    def merge(self, snapshot):
+        for name, (seconds, count) in snapshot["phases"].items():
+            self.add(name, None, seconds, count)
+        for contract, phases in snapshot["contracts"].items():
+            for name, (seconds, count) in phases.items():
+                totals = self.contracts.setdefault(contract, {}).setdefault(name, [0.0, 0])
+                totals[0] += seconds
+                totals[1] += count
+
+    def report(self, phase_order):
+        names = [_ for _ in phase_order if _ in self.phases]
+        names += sorted([_ for _ in self.phases if _ not in phase_order])
+
+        print("\n%-24s %10s %8s" % ("Phase", "Seconds", "Count"))
+        for name in names:
+            seconds, count = self.phases[name]
+            print("%-24s %10.4f %8s" % (name, seconds, count))
+
+        if len(self.contracts) == 0:
+            return
+
+        # Slowest contracts first.
+        totals = {}
+        for contract, phases in self.contracts.items():
+            totals[contract] = sum([_[0] for _ in phases.values()])
+        contracts = sorted(totals.keys(), key=lambda _: (-totals[_], _))
+
+        width = max([len(_) for _ in contracts])
+        print("\n%-*s %10s  %s" % (width, "Contract", "Seconds", "Phases"))
+        for contract in contracts:
+            phases = self.contracts[contract]
+            breakdown = ", ".join(["%s %.4f" % (_, phases[_][0]) for _ in names if _ in phases])
+            print("%-*s %10.4f  %s" % (width, contract, totals[contract], breakdown))
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=4, sort_keys=True)
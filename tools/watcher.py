@@ -0,0 +1,76 @@
+from os import stat, walk
+from os.path import join
+from time import monotonic, sleep
+from traceback import print_exc
+
+# How often the watched directories are polled, in seconds.
+POLL_INTERVAL = 0.25
+
+# How long the watched directories must be quiet before changes are handed off, in seconds. A single hardhat compile
+# writes many files over a short period, so this coalesces them into a single pass.
+DEBOUNCE = 1.0
+
+# Returns the modification time and size of every file under the roots with one of the given suffixes.
+def scan(roots, suffixes):
+    files = {}
+    for src_root in roots:
+        for root, dirs, names in walk(src_root):
+            for name in names:
+                if not name.endswith(suffixes):
+                    continue
+
+                path = join(root, name)
+                try:
+                    details = stat(path)
+                except OSError:
+                    # It was removed while we were scanning.
+                    continue
+                files[path] = (details.st_mtime_ns, details.st_size)
+
+    return files
+
+# Returns the paths that were added, modified or removed between the two scans.
+def diff(before, after):
+    changed = set()
+    for path in after:
+        if before.get(path) != after[path]:
+            changed.add(path)
+    for path in before:
+        if path not in after:
+            changed.add(path)
+
+    return changed
+
+# Polls the roots for changes to files with the given suffixes, calling back with the sorted list of changed paths
+# once a burst of changes has settled. Runs until interrupted.
+#
+# An error in the callback is logged rather than ending the watch, as a file may have been caught half-written. The
+# paths it was called with are passed again with the next change, so they aren't missed.
+def watch(roots, suffixes, callback, interval=POLL_INTERVAL, debounce=DEBOUNCE):
+    suffixes = tuple(suffixes)
+    snapshot = scan(roots, suffixes)
+    pending = set()
+    failed = set()
+    last_change = 0.0
+
+    print("Watching: %s" % ", ".join(roots))
+    while True:
+        sleep(interval)
+        current = scan(roots, suffixes)
+        changed = diff(snapshot, current)
+        snapshot = current
+
+        if len(changed) > 0:
+            pending |= changed | failed
+            failed = set()
+            last_change = monotonic()
+            continue
+
+        if len(pending) > 0 and monotonic() - last_change >= debounce:
+            try:
+                callback(sorted(pending))
+            except Exception:
+                print_exc()
+                print("Retrying with the next change")
+                failed = pending
+            pending = set()